@@ -0,0 +1 @@
+"""Juparc benchmarks"""
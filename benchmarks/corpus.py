@@ -0,0 +1,318 @@
+"""Corpus generator: write seeded synthetic notebooks for benchmarks
+
+Usage: python -m benchmarks.corpus DIRECTORY [-c COUNT] [-s SEED] [options]
+
+Notebooks mix code cells with imports, IPython magics, shell commands,
+definitions, and loops, markdown cells of a given richness, and outputs
+of a given size. Execution counts are mostly in order, with some skipped,
+repeated, and unexecuted cells. The same seed and options always produce
+the same files
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+
+# nbformat versions of generated notebooks. 3 uses worksheets
+VERSIONS = ["3", "4.0", "4.4"]
+
+MODULES = [
+    ("numpy", "np"), ("pandas", "pd"), ("matplotlib.pyplot", "plt"),
+    ("seaborn", "sns"), ("os", None), ("sys", None), ("re", None),
+    ("json", None), ("collections", None), ("sklearn.model_selection", None),
+    ("scipy.stats", "stats"), ("requests", None), ("mymodule", None),
+]
+
+FROM_IMPORTS = [
+    ("collections", "Counter"), ("sklearn.linear_model", "LinearRegression"),
+    ("os.path", "join"), ("datetime", "datetime"), ("pathlib", "Path"),
+    ("mymodule", "helper"),
+]
+
+LINE_MAGICS = [
+    "%matplotlib inline", "%load_ext autoreload", "%autoreload 2",
+    "%time total = sum(values)", "!pip install requests", "files = !ls",
+    "%pwd", "values?", "len??", "%env DEBUG=1",
+]
+
+CELL_MAGICS = ["%%time", "%%timeit", "%%capture output", "%%bash", "%%writefile script.py"]
+
+WORDS = [
+    "data", "model", "the", "homework", "assignment", "analysis", "result",
+    "course", "exercise", "lesson", "value", "plot", "and", "of", "train",
+    "test", "feature", "we", "load", "clean", "this", "notebook", "is",
+]
+
+
+def words(rng, count):
+    """Return count random words"""
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def identifier(rng):
+    """Return random identifier"""
+    return "{}_{}".format(rng.choice(["df", "x", "values", "model", "result", "item"]), rng.randrange(10))
+
+
+def import_lines(rng):
+    """Return import statements"""
+    lines = []
+    for _ in range(rng.randint(1, 3)):
+        if rng.random() < 0.3:
+            module, name = rng.choice(FROM_IMPORTS)
+            lines.append("from {} import {}".format(module, name))
+        else:
+            module, alias = rng.choice(MODULES)
+            lines.append("import {}{}".format(module, " as " + alias if alias else ""))
+    return lines
+
+
+def statement_lines(rng):
+    """Return Python statements"""
+    kind = rng.randrange(6)
+    name = identifier(rng)
+    if kind == 0:
+        return ["def {}(a, b=1, *args, **kwargs):".format(name.replace("_", "")),
+                "    \"\"\"{}\"\"\"".format(words(rng, 5)),
+                "    return a + b * len(args)"]
+    if kind == 1:
+        return ["for i in range({}):".format(rng.randrange(2, 20)),
+                "    if i % 2 == 0:",
+                "        {}.append(i ** 2)".format(name),
+                "    else:",
+                "        print(i, {!r})".format(words(rng, 2))]
+    if kind == 2:
+        return ["class Model{}(object):".format(rng.randrange(5)),
+                "    def fit(self, x):",
+                "        self.x = [v for v in x if v > {}]".format(rng.randrange(10)),
+                "        return self"]
+    if kind == 3:
+        return ["with open({!r}) as f:".format("data{}.csv".format(rng.randrange(3))),
+                "    {} = [line.split(',') for line in f]".format(name)]
+    if kind == 4:
+        return ["{} = {{'a': {}, 'b': [1, 2, 3], 'c': lambda x: x + 1}}".format(name, rng.random()),
+                "{}['a'] += 1".format(name)]
+    return ["try:",
+            "    {} = int({!r})".format(name, str(rng.randrange(100))),
+            "except ValueError as err:",
+            "    raise RuntimeError(err)"]
+
+
+def code_source(rng, magics, imports):
+    """Return source of a code cell"""
+    lines = []
+    if rng.random() < magics * 0.2:
+        lines.append(rng.choice(CELL_MAGICS))
+    if rng.random() < imports:
+        lines.extend(import_lines(rng))
+    for _ in range(rng.randint(1, 4)):
+        if rng.random() < magics:
+            lines.append(rng.choice(LINE_MAGICS))
+        lines.extend(statement_lines(rng))
+    if rng.random() < 0.2:
+        lines.append("")  # trailing new line
+    lines.append(identifier(rng))
+    return "\n".join(lines)
+
+
+def markdown_source(rng, richness):
+    """Return source of a markdown cell
+
+    Richness 0 has plain paragraphs. 1 adds headers and emphasis.
+    2 adds lists, links, and inline code. 3 adds tables, math, images, and code blocks
+    """
+    blocks = [words(rng, rng.randint(5, 40)) + "." for _ in range(rng.randint(1, 3))]
+    if richness >= 1:
+        blocks.insert(0, "#" * rng.randint(1, 4) + " " + words(rng, 3).title())
+        blocks.append("Some **{}** and *{}* text.".format(words(rng, 2), words(rng, 1)))
+    if richness >= 2:
+        blocks.append("\n".join("- {} `{}`".format(words(rng, 4), identifier(rng)) for _ in range(3)))
+        blocks.append("1. [{}](https://example.com/{})".format(words(rng, 2), rng.randrange(100)))
+    if richness >= 3:
+        blocks.append("| a | b |\n|---|---|\n| {} | {} |".format(rng.random(), rng.random()))
+        blocks.append("$$x_{{i}}^2 + {} = y$$ and $\\alpha$".format(rng.randrange(10)))
+        blocks.append("![plot](images/plot{}.png)".format(rng.randrange(5)))
+        blocks.append("```python\nprint({!r})\n```".format(words(rng, 2)))
+    return "\n\n".join(blocks)
+
+
+def output_text(rng, size):
+    """Return text output with about size characters"""
+    text = words(rng, max(1, size // 6))
+    return text[:size] + "\n"
+
+
+def code_outputs(rng, output_size, version):
+    """Return outputs of a code cell in the nbformat version"""
+    if output_size <= 0 or rng.random() < 0.3:
+        return []
+    kind = rng.randrange(3)
+    text = output_text(rng, rng.randint(1, output_size))
+    if kind == 0:
+        if version == "3":
+            return [{"output_type": "stream", "stream": "stdout", "text": text}]
+        return [{"output_type": "stream", "name": "stdout", "text": text}]
+    if kind == 1:
+        if version == "3":
+            return [{"output_type": "pyout", "prompt_number": 1, "metadata": {}, "text": text}]
+        return [{"output_type": "execute_result", "execution_count": 1,
+                 "metadata": {}, "data": {"text/plain": text}}]
+    image = base64.b64encode(rng.getrandbits(8 * output_size).to_bytes(output_size, "little")).decode()
+    if version == "3":
+        return [{"output_type": "display_data", "metadata": {}, "png": image, "text": "<Figure>"}]
+    return [{"output_type": "display_data", "metadata": {},
+             "data": {"image/png": image, "text/plain": "<Figure>"}}]
+
+
+def execution_counts(rng, count):
+    """Return execution counts of count code cells: mostly ordered, with gaps and reruns"""
+    result = []
+    current = 0
+    for _ in range(count):
+        draw = rng.random()
+        if draw < 0.05:
+            result.append(None)
+            continue
+        current += rng.randint(2, 5) if draw < 0.15 else 1
+        result.append(rng.randint(1, current) if draw > 0.95 else current)
+    return result
+
+
+def notebook(
+        rng, cells=20, magics=0.1, imports=0.3, markdown=1,
+        output_size=200, version="4.4", markdown_ratio=0.4
+):
+    """Generate notebook dict with cells cells in the nbformat version"""
+    kinds = ["markdown" if rng.random() < markdown_ratio else "code" for _ in range(cells)]
+    counts = iter(execution_counts(rng, kinds.count("code")))
+    metadata = {}
+    if rng.random() < 0.9:  # the others have unknown language
+        metadata["language_info"] = {
+            "name": "python", "version": rng.choice(["2.7.18", "3.6.9", "3.8.5", "3.11.4"])
+        }
+    result_cells = []
+    for kind in kinds:
+        if kind == "markdown":
+            source = markdown_source(rng, markdown)
+            if version == "3" and rng.random() < 0.2:
+                result_cells.append({"cell_type": "heading", "level": rng.randint(1, 3),
+                                     "metadata": {}, "source": words(rng, 3)})
+            else:
+                result_cells.append({"cell_type": "markdown", "metadata": {}, "source": source})
+            continue
+        count = next(counts)
+        source = code_source(rng, magics, imports)
+        outputs = code_outputs(rng, output_size, version) if count is not None else []
+        if version == "3":
+            for output in outputs:
+                if "prompt_number" in output:
+                    output["prompt_number"] = count
+            result_cells.append({"cell_type": "code", "collapsed": False, "input": source,
+                                 "language": "python", "metadata": {},
+                                 "outputs": outputs, "prompt_number": count})
+        else:
+            for output in outputs:
+                if "execution_count" in output:
+                    output["execution_count"] = count
+            result_cells.append({"cell_type": "code", "execution_count": count,
+                                 "metadata": {}, "outputs": outputs, "source": source})
+    if version == "3":
+        return {
+            "metadata": dict(metadata, name=""),
+            "nbformat": 3, "nbformat_minor": 0,
+            "worksheets": [{"cells": result_cells, "metadata": {}}],
+        }
+    major, minor = version.split(".")
+    return {
+        "cells": result_cells,
+        "metadata": dict(metadata, kernelspec={
+            "display_name": "Python", "language": "python", "name": "python3"
+        }),
+        "nbformat": int(major), "nbformat_minor": int(minor),
+    }
+
+
+def generate(
+        directory, count=100, seed=0, min_cells=5, max_cells=60,
+        versions=None, **options
+):
+    """Write count notebooks to directory. Returns their paths
+
+    Options are passed to notebook (magics, imports, markdown, output_size, markdown_ratio)
+    """
+    rng = random.Random(seed)
+    versions = versions or VERSIONS
+    paths = []
+    for index in range(count):
+        folder = os.path.join(directory, "repo{}".format(index // 10))
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, "notebook{}.ipynb".format(index))
+        generated = notebook(
+            rng, cells=rng.randint(min_cells, max_cells),
+            version=versions[index % len(versions)], **options
+        )
+        with open(path, "w", encoding="utf-8") as notebook_file:
+            json.dump(generated, notebook_file, indent=1)
+        paths.append(path)
+    return paths
+
+
+def add_corpus_arguments(parser):
+    """Add generator options to parser"""
+    parser.add_argument("-c", "--count", default=100, type=int, help="Number of notebooks")
+    parser.add_argument("-s", "--seed", default=0, type=int, help="Random seed")
+    parser.add_argument("--min-cells", default=5, type=int, help="Minimum cells per notebook")
+    parser.add_argument("--max-cells", default=60, type=int, help="Maximum cells per notebook")
+    parser.add_argument(
+        "--magics", default=0.1, type=float,
+        help="Probability of IPython magics and shell commands in code cells"
+    )
+    parser.add_argument(
+        "--imports", default=0.3, type=float,
+        help="Probability of import statements in code cells"
+    )
+    parser.add_argument(
+        "--markdown", default=1, type=int, choices=[0, 1, 2, 3],
+        help="Markdown richness: 0 paragraphs, 1 headers, 2 lists and links, "
+             "3 tables, math, images, and code blocks"
+    )
+    parser.add_argument(
+        "--markdown-ratio", default=0.4, type=float,
+        help="Fraction of markdown cells"
+    )
+    parser.add_argument(
+        "--output-size", default=200, type=int,
+        help="Maximum size of cell outputs in bytes. Use 0 for no outputs"
+    )
+    parser.add_argument(
+        "--versions", default=VERSIONS, nargs="*", choices=VERSIONS,
+        help="nbformat versions of the notebooks, in turns"
+    )
+
+
+def corpus_options(args):
+    """Return generate keyword arguments from parsed args"""
+    return {
+        "count": args.count, "seed": args.seed,
+        "min_cells": args.min_cells, "max_cells": args.max_cells,
+        "versions": args.versions, "magics": args.magics, "imports": args.imports,
+        "markdown": args.markdown, "markdown_ratio": args.markdown_ratio,
+        "output_size": args.output_size,
+    }
+
+
+def main():
+    """Generate corpus"""
+    parser = argparse.ArgumentParser(description="Juparc synthetic notebook corpus")
+    parser.add_argument("directory", help="Output directory")
+    add_corpus_arguments(parser)
+    args = parser.parse_args()
+    paths = generate(args.directory, **corpus_options(args))
+    print("{} notebooks written to {}".format(len(paths), args.directory))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
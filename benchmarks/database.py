@@ -0,0 +1,135 @@
+"""Database benchmark: compare the database sink with row-by-row inserts
+
+Usage: python -m benchmarks.database NOTEBOOKS.json [--min-speedup 10]
+
+Loads the notebooks (output of extract or code-features) into temporary
+SQLite databases in two ways. The first uses DatabaseSink. The second
+commits one INSERT per row with the default SQLite settings, like a naive
+loader. It checks that both databases have the same rows, that the
+plain values of the notebooks (e.g., status) are stored as they are, and
+fails if the sink is not min-speedup times faster
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from juparc.cli.stream import read_json
+from juparc.database import (
+    DatabaseSink, TABLES, connect, create_table_sql, notebook_rows, quote
+)
+
+
+def sink_load(path, notebooks, batch_size):
+    """Load notebooks with DatabaseSink. Returns the elapsed time"""
+    connection, dialect = connect(path)
+    start = time.perf_counter()
+    sink = DatabaseSink(connection, dialect, batch_size=batch_size)
+    sink.create_tables()
+    sink.write(notebooks)
+    elapsed = time.perf_counter() - start
+    connection.close()
+    return elapsed
+
+
+def row_load(path, notebooks):
+    """Load notebooks committing one INSERT per row. Returns the elapsed time"""
+    connection = sqlite3.connect(path, isolation_level=None)
+    start = time.perf_counter()
+    for table in TABLES:
+        connection.execute(create_table_sql(table))
+    for notebook_id, notebook in enumerate(notebooks, 1):
+        for table, row in notebook_rows(notebook_id, notebook):
+            connection.execute("INSERT INTO {} VALUES ({})".format(
+                quote(table), ", ".join("?" for _ in row)
+            ), row)
+    elapsed = time.perf_counter() - start
+    connection.close()
+    return elapsed
+
+
+def table_rows(path):
+    """Return sorted rows of each table"""
+    connection = sqlite3.connect(path)
+    result = {
+        table: sorted(map(repr, connection.execute("SELECT * FROM {}".format(quote(table)))))
+        for table in TABLES
+    }
+    connection.close()
+    return result
+
+
+def plain_mismatches(path, notebooks):
+    """Return [(notebook, column, stored, value)] of plain notebook values stored differently
+
+    Plain values are the text values of extracted notebooks, like name and
+    status. They must be stored as they are, without JSON encoding
+    """
+    columns = [column for column, _ in TABLES["notebooks"][1:]]
+    connection = sqlite3.connect(path)
+    stored = connection.execute("SELECT {} FROM notebooks ORDER BY id".format(
+        ", ".join(quote(column) for column in columns)
+    ))
+    result = [
+        (notebook.get("name"), column, value, notebook.get(column))
+        for notebook, row in zip(notebooks, stored)
+        for column, value in zip(columns, row)
+        if isinstance(notebook.get(column), str) and value != notebook.get(column)
+    ]
+    connection.close()
+    return result
+
+
+def main():
+    """Run database benchmark"""
+    parser = argparse.ArgumentParser(description="Juparc database benchmark")
+    parser.add_argument("notebooks", help="JSON or JSON Lines file with notebooks")
+    parser.add_argument(
+        "-s", "--min-speedup", default=10.0, type=float,
+        help="Minimum speedup of the sink over row-by-row inserts"
+    )
+    parser.add_argument(
+        "-b", "--batch-size", default=1000, type=int,
+        help="Notebooks per transaction of the sink"
+    )
+    parser.add_argument(
+        "-x", "--scale", default=1, type=int,
+        help="Number of times the notebooks are loaded"
+    )
+    args = parser.parse_args()
+    with open(args.notebooks, "r", encoding="utf-8") as notebooks_file:
+        notebooks = list(read_json(notebooks_file)) * args.scale
+
+    with tempfile.TemporaryDirectory() as directory:
+        sink_path = os.path.join(directory, "sink.sqlite")
+        row_path = os.path.join(directory, "rows.sqlite")
+        sink_time = sink_load(sink_path, notebooks, args.batch_size)
+        row_time = row_load(row_path, notebooks)
+        same = table_rows(sink_path) == table_rows(row_path)
+        mismatches = plain_mismatches(sink_path, notebooks)
+
+    rows = sum(1 for notebook in notebooks for _ in notebook_rows(0, notebook))
+    speedup = row_time / sink_time
+    print("{} notebooks, {} rows: sink {:.3f}s ({:.0f} rows/s), row-by-row {:.3f}s, speedup {:.1f}x".format(
+        len(notebooks), rows, sink_time, rows / sink_time, row_time, speedup
+    ))
+    failed = False
+    if not same:
+        print("The databases have different rows")
+        failed = True
+    if mismatches:
+        name, column, stored, value = mismatches[0]
+        print("{} plain values are stored differently. {} {}: {!r} instead of {!r}".format(
+            len(mismatches), name, column, stored, value
+        ))
+        failed = True
+    if speedup < args.min_speedup:
+        print("Speedup below {}x".format(args.min_speedup))
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
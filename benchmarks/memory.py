@@ -0,0 +1,243 @@
+"""Memory benchmark: measure the memory footprint of each stage per notebook
+
+Usage: python -m benchmarks.memory [--corpus DIR | -n NOTEBOOKS...] [-c COUNT]
+                                   [-o RESULTS.json] [--baseline BASELINE.json]
+
+Runs each stage in this process over every notebook of a directory, of a
+list of files, or of a generated corpus. Stages are measured separately:
+
+  load: juparc.extract.load (read, parse, convert, and load_cells)
+  load_cells: juparc.extract.load_cells of a parsed notebook
+  CellVisitor: code features of the code cells (see juparc.code)
+  CountRenderer: markdown features of the markdown cells (see juparc.markdown)
+  aggregate-code: aggregate_ast, aggregate_modules, aggregate_names, aggregate_ipython
+  aggregate-markdown: aggregate_markdown of the markdown features
+
+For each notebook and stage, it records the tracemalloc peak over the
+memory allocated before the stage, and the RSS growth. The report has the
+max, mean, and p95 peak of each stage, bytes per cell, bytes per output
+byte (the JSON size of the stage result), and the notebooks with the
+largest peaks. The first notebook runs once before the measures, so lazy
+imports are not attributed to it. Use -o to store the summaries and --baseline to fail if
+the max peak of any stage grew
+"""
+import argparse
+import gc
+import glob
+import json
+import os
+import resource
+import sys
+import tempfile
+import tracemalloc
+
+from argparse import Namespace
+
+from benchmarks.corpus import add_corpus_arguments, corpus_options, generate
+from benchmarks.results import add_results_arguments, report
+
+STAGES = ["load", "load_cells", "CellVisitor", "CountRenderer", "aggregate-code", "aggregate-markdown"]
+
+
+def current_rss():
+    """Return RSS of this process in bytes or 0 if it is not available"""
+    from juparc.parallel import process_usage
+    return process_usage(os.getpid())[1] or 0
+
+
+def measure(function):
+    """Call function. Returns (result, tracemalloc peak bytes, RSS growth bytes)"""
+    gc.collect()
+    rss = current_rss()
+    tracemalloc.reset_peak()
+    start = tracemalloc.get_traced_memory()[0]
+    result = function()
+    peak = tracemalloc.get_traced_memory()[1] - start
+    return result, peak, current_rss() - rss
+
+
+def output_bytes(result):
+    """Return the JSON size of a stage result"""
+    from juparc.records import json_default
+    return len(json.dumps(result, default=json_default))
+
+
+def parsed_cells(path):
+    """Parse notebook like load. Returns its cells"""
+    from juparc.extract import read_bytes
+    from juparc.reader import convert_notebook, read_notebook
+    return convert_notebook(read_notebook(read_bytes(path))[0])["cells"]
+
+
+def notebook_stages(path, checker):
+    """Yield (stage, function, items) of notebook path
+
+    Functions of a stage use the results of the previous stages
+    """
+    from juparc.code import (
+        aggregate_ast, aggregate_ipython, aggregate_modules, aggregate_names,
+        supressed_extract_code_features
+    )
+    from juparc.extract import create_default, load, load_cells
+    from juparc.markdown import aggregate_markdown, extract_features
+    state = {}
+
+    def run_load():
+        state["notebook"] = load(path)
+        return state["notebook"]
+
+    def run_load_cells():
+        notebook = state["notebook"]
+        lang_tuple = notebook["language"], notebook["language_version"]
+        return load_cells(lang_tuple, create_default(path), state["parsed"])
+
+    def code_features():
+        return [
+            supressed_extract_code_features(cell["source"], checker)
+            for cell in state["notebook"]["cells"] if cell["cell_type"] == "code"
+        ]
+
+    def markdown_features():
+        state["features"] = [
+            {"features": extract_features(cell["source"])}
+            for cell in state["notebook"]["cells"] if cell["cell_type"] == "markdown"
+        ]
+        return state["features"]
+
+    def aggregate_code():
+        from juparc.cli.code_features_cmd import iter_enrich_notebooks
+        notebook = next(iter_enrich_notebooks([load(path)], Namespace(
+            ignore_ast=False, ignore_modules=False, ignore_names=False,
+            ignore_ipython=False, ignore_others=None, keep=None
+        )))
+        return measure(lambda: {
+            "ast": aggregate_ast(notebook), "modules": aggregate_modules(notebook),
+            "names": aggregate_names(notebook), "ipython": aggregate_ipython(notebook),
+        })
+
+    yield "load", run_load, lambda: len(state["notebook"].get("cells") or [])
+    if state["notebook"]["status"] != "ok":
+        return
+    state["parsed"] = parsed_cells(path)
+    yield "load_cells", run_load_cells, lambda: len(state["parsed"])
+    cells = state["notebook"]["cells"]
+    count = {kind: sum(1 for cell in cells if cell["cell_type"] == kind) for kind in ("code", "markdown")}
+    python = state["notebook"]["language"] == "python"
+    if python:  # code features are extracted from Python notebooks (see juparc python)
+        yield "CellVisitor", code_features, lambda: count["code"]
+    yield "CountRenderer", markdown_features, lambda: count["markdown"]
+    if python:
+        yield "aggregate-code", aggregate_code, lambda: count["code"]
+    yield "aggregate-markdown", lambda: aggregate_markdown(state["features"]), lambda: count["markdown"]
+
+
+def profile_notebook(path, stages):
+    """Measure the stages of notebook path. Returns {stage: measures}"""
+    from juparc.code import local_checker
+    measures = {}
+    for name, function, items in notebook_stages(path, local_checker(path)):
+        result, peak, rss = measure(function)
+        if name == "aggregate-code":
+            # Enriching the notebook is not part of the aggregation
+            result, peak, rss = result
+        if stages and name not in stages:
+            continue
+        measures[name] = {
+            "peak": peak, "rss": rss, "items": items(), "output_bytes": output_bytes(result),
+        }
+    return measures
+
+
+def percentile(values, fraction):
+    """Return the value at fraction of the sorted values"""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0
+
+
+def summarize(rows, top):
+    """Return {stage: summary} of the notebook rows"""
+    summary = {}
+    for stage in STAGES:
+        measures = [(row["name"], row["stages"][stage]) for row in rows if stage in row["stages"]]
+        if not measures:
+            continue
+        peaks = [measure["peak"] for _, measure in measures]
+        items = sum(measure["items"] for _, measure in measures)
+        output = sum(measure["output_bytes"] for _, measure in measures)
+        summary[stage] = {
+            "notebooks": len(measures),
+            "peak": max(peaks),
+            "mean_peak": sum(peaks) / len(peaks),
+            "p95_peak": percentile(peaks, 0.95),
+            "max_rss_growth": max(measure["rss"] for _, measure in measures),
+            "bytes_per_cell": sum(peaks) / items if items else 0.0,
+            "bytes_per_output_byte": sum(peaks) / output if output else 0.0,
+            "worst": [
+                [name, measure["peak"], measure["items"], measure["output_bytes"]]
+                for name, measure in sorted(measures, key=lambda item: -item[1]["peak"])[:top]
+            ],
+        }
+    return summary
+
+
+def notebook_paths(args, directory):
+    """Return notebooks of args: files, a directory, or a generated corpus"""
+    if args.notebooks:
+        return args.notebooks
+    if args.corpus:
+        return sorted(glob.glob(os.path.join(args.corpus, "**", "*.ipynb"), recursive=True))
+    return generate(directory, **corpus_options(args))
+
+
+def main():
+    """Run memory benchmark"""
+    parser = argparse.ArgumentParser(description="Juparc memory benchmark")
+    add_corpus_arguments(parser)
+    parser.add_argument("--corpus", default=None, help="Directory with notebooks")
+    parser.add_argument("-n", "--notebooks", default=None, nargs="*", help="Notebook files")
+    parser.add_argument(
+        "-k", "--select", default=None, nargs="*", choices=STAGES,
+        help="Report only these stages"
+    )
+    parser.add_argument("--top", default=5, type=int, help="Number of worst notebooks per stage")
+    parser.add_argument(
+        "--details", default=None,
+        help="Write the measures of each notebook to a JSON Lines file"
+    )
+    add_results_arguments(parser)
+    parser.set_defaults(count=20)
+    args = parser.parse_args()
+
+    rows = []
+    tracemalloc.start()
+    with tempfile.TemporaryDirectory() as directory:
+        paths = notebook_paths(args, directory)
+        # Warm up: lazy imports and model loading (e.g., langdetect) are not per notebook
+        for path in paths[:1]:
+            profile_notebook(path, args.select)
+        for path in paths:
+            rows.append({"name": path, "stages": profile_notebook(path, args.select)})
+    tracemalloc.stop()
+    summary = summarize(rows, args.top)
+
+    if args.details:
+        with open(args.details, "w", encoding="utf-8") as details:
+            for row in rows:
+                details.write(json.dumps(row) + "\n")
+    print("{} notebooks, max RSS {:.1f} MB".format(
+        len(rows), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    ))
+    print("{:<20} {:>12} {:>12} {:>12} {:>12} {:>10}".format(
+        "stage", "max peak", "p95 peak", "rss growth", "bytes/cell", "bytes/out"
+    ))
+    for stage, stats in summary.items():
+        print("{:<20} {:>12,} {:>12,} {:>12,} {:>12,.0f} {:>10.1f}".format(
+            stage, stats["peak"], stats["p95_peak"], stats["max_rss_growth"],
+            stats["bytes_per_cell"], stats["bytes_per_output_byte"]
+        ))
+        print("  worst: {} ({:,} bytes)".format(*stats["worst"][0][:2]))
+    return report(summary, args, key="peak")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
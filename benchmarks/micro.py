@@ -0,0 +1,127 @@
+"""Micro-benchmarks: time the hot functions of juparc on a synthetic corpus
+
+Usage: python -m benchmarks.micro [-c COUNT] [-r REPEAT] [-o RESULTS.json]
+                                  [--baseline BASELINE.json] [corpus options]
+
+Each benchmark calls a function on every item of the corpus (notebooks,
+code cells, or markdown cells) and reports the best of the repeats in
+seconds and microseconds per item. Use -o to store the results and
+--baseline to fail if any benchmark is slower than a stored run
+"""
+import argparse
+import sys
+import tempfile
+import time
+
+from argparse import Namespace
+
+from benchmarks.corpus import add_corpus_arguments, corpus_options, generate
+from benchmarks.results import add_results_arguments, report
+
+
+def best_time(function, items, repeat):
+    """Return the best time of calling function on all items"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            function(item)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def prepare(paths):
+    """Load the corpus once. Returns inputs of the benchmarks"""
+    from juparc.cli.code_features_cmd import iter_enrich_notebooks
+    from juparc.extract import extracted_code_cells, load
+    from juparc.markdown import extract_features
+    notebooks = [load(path) for path in paths]
+    cells = [cell for notebook in notebooks for cell in notebook["cells"]]
+    markdown = [cell["source"] for cell in cells if cell["cell_type"] == "markdown"]
+    # Code features are extracted from Python notebooks (see juparc python)
+    python = [notebook for notebook in notebooks if notebook["language"] == "python"]
+    enriched = list(iter_enrich_notebooks(
+        [load(notebook["name"]) for notebook in python],
+        Namespace(ignore_ast=False, ignore_modules=False, ignore_names=False,
+                  ignore_ipython=False, ignore_others=None, keep=None)
+    ))
+    return {
+        "paths": paths,
+        "raw_sources": [cell["raw_source"] for cell in cells if cell["cell_type"] == "code"],
+        "sources": [
+            cell["source"] for notebook in python
+            for cell in notebook["cells"] if cell["cell_type"] == "code"
+        ],
+        "markdown": markdown,
+        "code_cells": [extracted_code_cells(notebook) for notebook in notebooks],
+        "enriched": enriched,
+        "markdown_groups": [
+            [{"features": extract_features(cell["source"])}
+             for cell in notebook["cells"] if cell["cell_type"] == "markdown"]
+            for notebook in notebooks
+        ],
+    }
+
+
+def benchmarks(paths):
+    """Return [(name, function, input)] of the hot functions"""
+    from juparc.code import (
+        aggregate_ast, aggregate_ipython, aggregate_modules, aggregate_names,
+        local_checker, supressed_extract_code_features
+    )
+    from juparc.extract import load
+    from juparc.markdown import aggregate_markdown, extract_features
+    from juparc.metrics import notebook_metrics
+    from juparc.transform import transform_cell
+    checker = local_checker(paths[0])
+    return [
+        ("load", load, "paths"),
+        ("load-fast", lambda path: load(path, reader="fast"), "paths"),
+        ("load-stream", lambda path: load(path, reader="stream"), "paths"),
+        ("transform_cell", transform_cell, "raw_sources"),
+        ("CellVisitor", lambda source: supressed_extract_code_features(source, checker), "sources"),
+        ("extract_features", extract_features, "markdown"),
+        ("notebook_metrics", notebook_metrics, "code_cells"),
+        ("aggregate_ast", aggregate_ast, "enriched"),
+        ("aggregate_modules", aggregate_modules, "enriched"),
+        ("aggregate_names", aggregate_names, "enriched"),
+        ("aggregate_ipython", aggregate_ipython, "enriched"),
+        ("aggregate_markdown", aggregate_markdown, "markdown_groups"),
+    ]
+
+
+def main():
+    """Run micro-benchmarks"""
+    parser = argparse.ArgumentParser(description="Juparc micro-benchmarks")
+    add_corpus_arguments(parser)
+    parser.add_argument("-r", "--repeat", default=3, type=int, help="Number of runs")
+    parser.add_argument(
+        "-k", "--select", default=None, nargs="*",
+        help="Run only these benchmarks"
+    )
+    add_results_arguments(parser)
+    parser.set_defaults(count=20)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        inputs = prepare(generate(directory, **corpus_options(args)))
+        for name, function, key in benchmarks(inputs["paths"]):
+            if args.select and name not in args.select:
+                continue
+            items = inputs[key]
+            function(items[0])  # warm up lazy imports and compilation
+            seconds = best_time(function, items, args.repeat)
+            results[name] = {
+                "seconds": seconds,
+                "items": len(items),
+                "per_item_us": seconds / len(items) * 1e6 if items else 0.0,
+            }
+            print("{:<20} {:>8} {:<12} {:>9.4f}s {:>11.1f}us/item".format(
+                name, len(items), key, seconds, results[name]["per_item_us"]
+            ))
+    return report(results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""Benchmark results: store measurements and compare them to a baseline
+
+Results are JSON objects {benchmark: {"seconds": ..., other metrics}}.
+A benchmark regresses if its seconds (or another metric, e.g., peak
+bytes) exceed the baseline by more than the tolerance (e.g., 0.2 for 20%)
+"""
+import json
+import platform
+import sys
+
+
+def save_results(path, results):
+    """Write results with the Python version and platform to path"""
+    with open(path, "w", encoding="utf-8") as output:
+        json.dump({
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }, output, indent=2)
+        output.write("\n")
+
+
+def load_results(path):
+    """Read results written by save_results"""
+    with open(path, "r", encoding="utf-8") as input_file:
+        return json.load(input_file)["results"]
+
+
+def regressions(results, baseline, tolerance, key="seconds"):
+    """Return [(benchmark, value, baseline value)] of key above the baseline
+
+    Benchmarks that are not in the baseline are ignored
+    """
+    return [
+        (name, result[key], baseline[name][key])
+        for name, result in results.items()
+        if name in baseline and result[key] > baseline[name][key] * (1 + tolerance)
+    ]
+
+
+def report(results, args, key="seconds"):
+    """Save results and compare their key to the baseline of args
+
+    Returns exit status: 1 if any benchmark regressed
+    """
+    if args.output:
+        save_results(args.output, results)
+    if not args.baseline:
+        return 0
+    worse = regressions(results, load_results(args.baseline), args.tolerance, key)
+    for name, value, previous in worse:
+        print("Regression {}: {} {:.4g}, baseline {:.4g} ({:+.0%})".format(
+            name, key, value, previous, value / previous - 1 if previous else float("inf")
+        ), file=sys.stderr)
+    return 1 if worse else 0
+
+
+def add_results_arguments(parser):
+    """Add --output, --baseline, and --tolerance arguments to parser"""
+    parser.add_argument("-o", "--output", default=None, help="Save results to a JSON file")
+    parser.add_argument(
+        "--baseline", default=None,
+        help="Results of a previous run. Fails if any benchmark regressed"
+    )
+    parser.add_argument(
+        "-t", "--tolerance", default=0.2, type=float,
+        help="Allowed increase over the baseline (0.2 is 20%%)"
+    )
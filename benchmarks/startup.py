@@ -0,0 +1,80 @@
+"""Startup benchmark: check the import time of juparc subcommands
+
+Usage: python -m benchmarks.startup [--budget SECONDS] [-- juparc args]
+
+By default, it runs `juparc list --help`. It fails if the median wall time
+exceeds the budget or if the command imports any heavy dependency
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# Dependencies that should only be imported by the commands that use them
+HEAVY_MODULES = [
+    "numba", "numpy", "IPython", "nbformat", "nbconvert",
+    "mistune", "langdetect", "nltk", "pyarrow",
+]
+
+
+def run_time(command):
+    """Measure wall time of command"""
+    start = time.perf_counter()
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def imported_modules(juparc_args):
+    """Return top level modules imported by juparc with juparc_args"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "juparc"] + juparc_args,
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True
+    )
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            name = line.rsplit("|", 1)[1].strip()
+            modules.add(name.split(".")[0])
+    return modules
+
+
+def main():
+    """Run startup benchmark"""
+    parser = argparse.ArgumentParser(description="Juparc startup benchmark")
+    parser.add_argument(
+        "-b", "--budget", default=0.3, type=float,
+        help="Maximum median wall time in seconds"
+    )
+    parser.add_argument(
+        "-r", "--repeat", default=5, type=int,
+        help="Number of runs"
+    )
+    parser.add_argument(
+        "juparc_args", nargs="*", default=["list", "--help"],
+        help="Juparc arguments"
+    )
+    args = parser.parse_args()
+
+    command = [sys.executable, "-m", "juparc"] + args.juparc_args
+    run_time(command)  # warm up filesystem caches
+    times = [run_time(command) for _ in range(args.repeat)]
+    median = statistics.median(times)
+    heavy = sorted(imported_modules(args.juparc_args) & set(HEAVY_MODULES))
+
+    print("juparc {}: median {:.3f}s, min {:.3f}s, budget {:.3f}s".format(
+        " ".join(args.juparc_args), median, min(times), args.budget
+    ))
+    failed = False
+    if heavy:
+        print("Heavy modules imported: {}".format(", ".join(heavy)))
+        failed = True
+    if median > args.budget:
+        print("Over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
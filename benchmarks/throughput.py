@@ -0,0 +1,147 @@
+"""Throughput benchmark: run every juparc subcommand on a synthetic corpus
+
+Usage: python -m benchmarks.throughput [-c COUNT] [-j JOBS] [-o RESULTS.json]
+                                       [--baseline BASELINE.json] [corpus options]
+
+Subcommands run as separate processes, chained like the README pipelines
+(list | extract | python | code-features | aggregate-code, etc.). Each
+step reads the output file of a previous step and reports the best wall
+time of the repeats, in notebooks per second and cells per second of the
+corpus. Use --corpus to run on an existing directory of notebooks instead
+of a generated one. Use -o to store the results and --baseline to fail if
+any subcommand is slower than a stored run
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import add_corpus_arguments, corpus_options, generate
+from benchmarks.results import add_results_arguments, report
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (subcommand, arguments, input file, output file, accepts --format).
+# {output} is the output directory and {corpus} the corpus directory
+STEPS = [
+    ("list", [], None, "list", True),
+    ("listreq", [], None, "listreq.json", False),
+    ("extract", ["-j", "{jobs}"], "list", "extract", True),
+    ("history", ["{corpus}", "-m", "{output}/revisions.jsonl", "-j", "{jobs}"], None, "history", True),
+    ("metrics", [], "extract", "metrics", True),
+    ("select", ["--status", "ok"], "extract", "select", True),
+    ("python", [], "extract", "python", True),
+    ("code-features", [], "python", "code-features", True),
+    ("aggregate-code", [], "code-features", "aggregate-code", True),
+    ("markdown", [], "extract", "markdown.txt", False),
+    ("markdown-features", [], "markdown.txt", "markdown-features", True),
+    ("aggregate-markdown", [], "markdown-features", "aggregate-markdown", True),
+    ("parquet", ["-o", "{output}/parquet"], "extract", "parquet.txt", False),
+    ("database", ["{output}/notebooks.sqlite", "--drop"], "code-features", "database.txt", False),
+]
+
+
+def commit_corpus(corpus):
+    """Commit the corpus to a new git repository for the history step"""
+    for args in (["init", "-q"], ["add", "-A"],
+                 ["-c", "user.name=bench", "-c", "user.email=bench@example.com",
+                  "commit", "-q", "-m", "corpus"]):
+        subprocess.run(["git", "-C", corpus] + args, check=True, stdout=subprocess.DEVNULL)
+
+
+def run_step(command, corpus, input_path, output_path):
+    """Run command in the corpus directory. Returns the wall time"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    with open(input_path or os.devnull, "rb") as input_file, open(output_path, "wb") as output:
+        start = time.perf_counter()
+        subprocess.run(
+            command, cwd=corpus, env=env, check=True,
+            stdin=input_file, stdout=output, stderr=subprocess.DEVNULL
+        )
+        return time.perf_counter() - start
+
+
+def count_cells(path):
+    """Return (notebooks, cells) of an extract output"""
+    from juparc.cli.stream import read_json
+    with open(path, "r", encoding="utf-8") as input_file:
+        notebooks = list(read_json(input_file))
+    return len(notebooks), sum(len(notebook.get("cells") or []) for notebook in notebooks)
+
+
+def run_steps(corpus, output, args):
+    """Run the selected steps. Yields (name, seconds)
+
+    The history step runs only if the corpus is a git repository
+    """
+    from juparc.gitrepo import is_git_dir
+    values = {"output": output, "corpus": corpus, "jobs": str(args.jobs)}
+    for name, arguments, input_name, output_name, formatted in STEPS:
+        if args.select and name not in args.select:
+            continue
+        if name == "history" and not is_git_dir(corpus):
+            continue
+        command = [sys.executable, "-m", "juparc", name] + [arg.format(**values) for arg in arguments]
+        if formatted:
+            command += ["--format", args.format]
+        input_path = input_name and os.path.join(output, input_name)
+        output_path = os.path.join(output, output_name)
+        seconds = min(
+            run_step(command, corpus, input_path, output_path)
+            for _ in range(args.repeat)
+        )
+        yield name, seconds
+
+
+def main():
+    """Run throughput benchmark"""
+    parser = argparse.ArgumentParser(description="Juparc throughput benchmark")
+    add_corpus_arguments(parser)
+    parser.add_argument(
+        "--corpus", default=None,
+        help="Directory with notebooks. Default: generate a corpus"
+    )
+    parser.add_argument("-j", "--jobs", default=2, type=int, help="Extract worker processes")
+    parser.add_argument("-r", "--repeat", default=1, type=int, help="Number of runs")
+    parser.add_argument(
+        "-f", "--format", default="jsonl", choices=["json", "jsonl", "orjson", "msgpack"],
+        help="Format of the intermediate files"
+    )
+    parser.add_argument(
+        "-k", "--select", default=None, nargs="*",
+        help="Run only these subcommands. Steps read the outputs of earlier steps"
+    )
+    add_results_arguments(parser)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = args.corpus
+        if corpus is None:
+            corpus = os.path.join(directory, "corpus")
+            generate(corpus, **corpus_options(args))
+            commit_corpus(corpus)
+        output = os.path.join(directory, "output")
+        os.makedirs(output)
+        times = list(run_steps(corpus, output, args))
+        extracted = os.path.join(output, "extract")
+        notebooks, cells = count_cells(extracted) if os.path.exists(extracted) else (0, 0)
+    print("{} notebooks, {} cells".format(notebooks, cells))
+    for name, seconds in times:
+        results[name] = {"seconds": seconds}
+        if notebooks:
+            results[name]["notebooks_per_second"] = notebooks / seconds
+            results[name]["cells_per_second"] = cells / seconds
+        print("{:<20} {:>8.3f}s {:>10} {:>14}".format(
+            name, seconds,
+            "{:.1f} nb/s".format(notebooks / seconds) if notebooks else "",
+            "{:.0f} cells/s".format(cells / seconds) if notebooks else ""
+        ))
+    return report(results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 """Juparc package"""
+from .version import __version__
 from .cli import main
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
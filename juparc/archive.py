@@ -0,0 +1,253 @@
+"""Archives: read repository snapshots (zip and tar) without unpacking them
+
+A file inside an archive is named ARCHIVE!/MEMBER, e.g.,
+repos/project.tar.gz!/analysis/notebook.ipynb. Open archives are cached
+per process. Tar members can be read in any order, but reading them in the
+archive order (as listed by list_members) decompresses the archive once.
+Git trees (REPO@REF, see juparc.gitrepo) are archives as well
+"""
+import fnmatch
+import lzma
+import os
+import re
+import tarfile
+import threading
+import time
+import zipfile
+import zlib
+
+from .gitrepo import is_git_tree, GitTree
+
+SEPARATOR = "!/"
+
+ARCHIVE_EXTENSIONS = (
+    ".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz",
+)
+
+# Errors of corrupted or truncated archives, raised as OSError
+ARCHIVE_ERRORS = (tarfile.TarError, zipfile.BadZipFile, EOFError, zlib.error, lzma.LZMAError)
+
+OPEN_ARCHIVES = {}
+ARCHIVES_LOCK = threading.Lock()
+
+
+def is_archive(path):
+    """Check if path is an archive file or a git tree"""
+    if path.lower().endswith(ARCHIVE_EXTENSIONS) and os.path.isfile(path):
+        return True
+    return not is_member(path) and is_git_tree(path)
+
+
+def is_member(name):
+    """Check if name refers to a file inside an archive"""
+    return SEPARATOR in name
+
+
+def split_member(name):
+    """Split ARCHIVE!/MEMBER into (archive, member)"""
+    archive, member = name.split(SEPARATOR, 1)
+    return archive, member
+
+
+def member_name(archive, member):
+    """Create ARCHIVE!/MEMBER name"""
+    return archive + SEPARATOR + member
+
+
+class Archive(object):
+    """Open zip or tar archive with an index of its regular files"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.members = {}
+        self.path_set = None
+        if zipfile.is_zipfile(path):
+            self.zip = zipfile.ZipFile(path)
+            self.tar = None
+            for info in self.zip.infolist():
+                if not info.is_dir():
+                    self.members[normalize(info.filename)] = info
+        else:
+            self.zip = None
+            self.tar = tarfile.open(path, "r:*")
+            for info in self.tar:
+                if info.isfile():
+                    self.members[normalize(info.name)] = info
+            self.tar.members = []
+
+    def names(self):
+        """Return member names in the archive order"""
+        return list(self.members)
+
+    def open(self, member):
+        """Open member as a binary file"""
+        info = self.members[member]
+        if self.zip is not None:
+            return self.zip.open(info)
+        return self.tar.extractfile(info)
+
+    def read(self, member):
+        """Read member content"""
+        with self.lock:
+            with self.open(member) as ofile:
+                return ofile.read()
+
+    def stat(self, member):
+        """Return (size, mtime in ns) of member"""
+        info = self.members[member]
+        if self.zip is not None:
+            mtime = int(time.mktime(info.date_time + (0, 0, -1))) * 10 ** 9
+            return info.file_size, mtime
+        return info.size, int(info.mtime) * 10 ** 9
+
+    def hash(self, member):  # pylint: disable=unused-argument
+        """Archives do not store content hashes"""
+        return None
+
+
+def normalize(member):
+    """Remove ./ and / prefixes of member names"""
+    while member.startswith("./"):
+        member = member[2:]
+    return member.lstrip("/")
+
+
+def open_archive(path):
+    """Return cached Archive of path"""
+    with ARCHIVES_LOCK:
+        archive = OPEN_ARCHIVES.get(path)
+        if archive is None:
+            try:
+                archive = GitTree(path) if is_git_tree(path) else Archive(path)
+            except ARCHIVE_ERRORS as err:
+                raise OSError("Cannot read archive {}: {}".format(path, err))
+            OPEN_ARCHIVES[path] = archive
+        return archive
+
+
+def close_archives():
+    """Forget open archives. Forked processes must not share their files"""
+    with ARCHIVES_LOCK:
+        OPEN_ARCHIVES.clear()
+
+
+def read_member(name):
+    """Read content of ARCHIVE!/MEMBER. Raises OSError if it does not exist or is corrupted"""
+    archive, member = split_member(name)
+    try:
+        return open_archive(archive).read(member)
+    except KeyError:
+        raise FileNotFoundError("{} is not in {}".format(member, archive))
+    except ARCHIVE_ERRORS as err:
+        raise OSError("Cannot read {}: {}".format(name, err))
+
+
+def check_archive(path):
+    """Raise OSError for archive path: it cannot be opened or its members must be loaded"""
+    open_archive(path)
+    raise IsADirectoryError("{} is an archive. Load its members".format(path))
+
+
+def stat_member(name):
+    """Return (size, mtime in ns) of ARCHIVE!/MEMBER"""
+    archive, member = split_member(name)
+    try:
+        return open_archive(archive).stat(member)
+    except KeyError:
+        raise FileNotFoundError("{} is not in {}".format(member, archive))
+
+
+def member_hash(name):
+    """Return content hash of ARCHIVE!/MEMBER stored in the archive (git blob id) or None"""
+    archive, member = split_member(name)
+    try:
+        return open_archive(archive).hash(member)
+    except KeyError:
+        raise FileNotFoundError("{} is not in {}".format(member, archive))
+
+
+def glob_regex(pattern):
+    """Translate recursive glob pattern to regex
+
+    As in glob.glob(pattern, recursive=True), ** matches any number of
+    directories and wildcards do not match names that start with a dot
+    """
+    parts = []
+    components = pattern.split("/")
+    for index, component in enumerate(components):
+        last = index == len(components) - 1
+        if component == "**":
+            parts.append(r"(?:(?!\.)[^/]+/)*" if not last else r"(?:(?!\.)[^/]+(?:/|\Z))*")
+            continue
+        regex = fnmatch.translate(component)[4:-3].replace(".*", "[^/]*")
+        if not component.startswith(".") and component[:1] in "*?[":
+            regex = r"(?!\.)" + regex
+        parts.append(regex + ("" if last else "/"))
+    return re.compile("".join(parts) + r"\Z")
+
+
+def list_members(path, pattern):
+    """List ARCHIVE!/MEMBER names that match glob pattern, in the archive order"""
+    regex = glob_regex(pattern)
+    return [
+        member_name(path, member) for member in open_archive(path).names()
+        if regex.match(member)
+    ]
+
+
+def member_paths(name):
+    """Return set of ARCHIVE!/PATH of the member files and directories of the archive of name"""
+    path, _ = split_member(name)
+    archive = open_archive(path)
+    if archive.path_set is None:
+        paths = set()
+        for member in archive.names():
+            parts = member.split("/")
+            for size in range(1, len(parts) + 1):
+                paths.add(member_name(path, "/".join(parts[:size])))
+        archive.path_set = paths
+    return archive.path_set
+
+
+def member_files(name):
+    """Return list of ARCHIVE!/MEMBER of the member files of the archive of name"""
+    archive, _ = split_member(name)
+    return [member_name(archive, member) for member in open_archive(archive).names()]
+
+
+def expand_archives(names, pattern="**/*.ipynb"):
+    """Replace archive files in names by their members that match pattern
+
+    Archives that cannot be read are yielded as they are, so they get
+    load-error results (see check_archive) without stopping the others
+    """
+    for name in names:
+        if is_archive(name):
+            try:
+                members = list_members(name, pattern)
+            except OSError:
+                yield name
+                continue
+            yield from members
+        else:
+            yield name
+
+
+def with_member_data(names):
+    """Read archive members in the current process
+
+    Yields (name, data, hash) tasks for members (see juparc.parallel.load_task)
+    and names for the others. The hash is the git blob id or None. Members
+    are read in the order of names, so tar archives listed in the archive
+    order are decompressed once. Members that cannot be read are yielded as
+    names
+    """
+    for name in names:
+        if is_member(name):
+            try:
+                yield name, read_member(name), member_hash(name)
+                continue
+            except OSError:
+                pass
+        yield name
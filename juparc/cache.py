@@ -0,0 +1,62 @@
+"""Extraction cache: store load results by file content"""
+import hashlib
+import json
+import sqlite3
+
+from .records import json_default
+
+# Version of the load results, used by the cache and by manifests (see
+# juparc.manifest). Bump it whenever load produces different results for
+# the same notebook file (e.g., new fields, fixed metrics), so results of
+# older extraction code are not reused. Releases that do not change the
+# results keep caches and manifests
+CACHE_SCHEMA = 1
+
+
+class ExtractionCache(object):
+    """SQLite cache of load results
+
+    Results are keyed by the sha1 of the notebook file, CACHE_SCHEMA,
+    the include/exclude projection, the count_words vocabulary, and the
+    reader. The database uses WAL mode, so multiple worker processes can
+    share the same cache file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS extraction "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+
+    def key(self, sha1_file, include=None, exclude=None, count_words=None, reader="nbformat"):
+        """Create cache key"""
+        options = {"include": include, "exclude": exclude, "count_words": None, "reader": reader}
+        if count_words is not None:
+            options["count_words"] = hashlib.sha1(json.dumps(count_words).encode("utf-8")).hexdigest()
+        return "schema{}:{}:{}".format(CACHE_SCHEMA, sha1_file, json.dumps(options, sort_keys=True))
+
+    def get(self, sha1_file, include=None, exclude=None, count_words=None, reader="nbformat"):
+        """Get cached result or None"""
+        row = self.connection.execute(
+            "SELECT value FROM extraction WHERE key = ?",
+            (self.key(sha1_file, include, exclude, count_words, reader),)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def put(self, sha1_file, result, include=None, exclude=None, count_words=None, reader="nbformat"):
+        """Store result"""
+        self.connection.execute(
+            "INSERT OR REPLACE INTO extraction (key, value) VALUES (?, ?)",
+            (self.key(sha1_file, include, exclude, count_words, reader),
+             json.dumps(result, default=json_default))
+        )
+
+    def close(self):
+        """Close database connection"""
+        self.connection.close()
@@ -1,29 +1,40 @@
 import argparse
-from . import list_cmd
-from . import listreq_cmd
-from . import extract_cmd
-from . import markdown_cmd
-from . import markdown_features_cmd
-from . import python_cmd
-from . import select_cmd
-from . import code_features_cmd
-from . import aggregate_markdown_cmd
-from . import aggregate_code_cmd
+import importlib
+import sys
+
+# Subcommands and the modules that define them, in the order of the help.
+# Only the module of the selected subcommand is imported
+COMMANDS = [
+    ('list', 'list_cmd'),
+    ('listreq', 'listreq_cmd'),
+    ('extract', 'extract_cmd'),
+    ('history', 'history_cmd'),
+    ('metrics', 'metrics_cmd'),
+    ('markdown', 'markdown_cmd'),
+    ('markdown-features', 'markdown_features_cmd'),
+    ('code-features', 'code_features_cmd'),
+    ('python', 'python_cmd'),
+    ('select', 'select_cmd'),
+    ('aggregate-markdown', 'aggregate_markdown_cmd'),
+    ('aggregate-code', 'aggregate_code_cmd'),
+    ('parquet', 'parquet_cmd'),
+    ('database', 'database_cmd'),
+]
+
+
+def selected_modules(argv):
+    """Return modules required to parse argv. Unknown subcommands require all modules"""
+    name = next((arg for arg in argv if not arg.startswith('-')), None)
+    modules = [module for cmd, module in COMMANDS if cmd == name]
+    return modules or [module for _, module in COMMANDS]
+
 
 def main():
     """JupArc Main CLI"""
     parser = argparse.ArgumentParser(description='Jupyter Analysis Tools')
     subparsers = parser.add_subparsers()
-    list_cmd.create_subparsers(subparsers)
-    listreq_cmd.create_subparsers(subparsers)
-    extract_cmd.create_subparsers(subparsers)
-    markdown_cmd.create_subparsers(subparsers)
-    markdown_features_cmd.create_subparsers(subparsers)
-    code_features_cmd.create_subparsers(subparsers)
-    python_cmd.create_subparsers(subparsers)
-    select_cmd.create_subparsers(subparsers)
-    aggregate_markdown_cmd.create_subparsers(subparsers)
-    aggregate_code_cmd.create_subparsers(subparsers)
+    for module in selected_modules(sys.argv[1:]):
+        importlib.import_module('.' + module, __name__).create_subparsers(subparsers)
 
     args, rest = parser.parse_known_args()
     if not getattr(args, 'func', None):
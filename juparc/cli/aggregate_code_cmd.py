@@ -1,30 +1,17 @@
 """Aggregate Code command: aggregate code features from python cells"""
-import json
-import sys
-
-from .code_features_cmd import enrich_notebooks
+from .code_features_cmd import iter_enrich_notebooks
+from .stream import read_json, write_json, add_jsonl_argument
 from ..extract import load
 from ..code import aggregate_ast, aggregate_modules
 from ..code import aggregate_ipython, aggregate_names
 
 
-def aggregate_code_cmd(args, _):
-    """aggregate code features cmd"""
-    if not args.notebooks:
-        lines = list(sys.stdin)
-        notebooks = json.loads("\n".join(lines))
-    else:
-        notebooks = [load(notebook) for notebook in args.notebooks]
-        args.ignore_others = None
-        args.keep = None
-        enrich_notebooks(notebooks, args)
-
-    result = []
+def aggregate_notebooks(notebooks, args):
+    """Aggregate code features of notebooks. Yields aggregated results"""
     for notebook in notebooks:
         nresult = {
             'name': notebook['name']
         }
-        result.append(nresult)
         if not args.ignore_ast:
             nresult['ast'] = aggregate_ast(notebook)
         if not args.ignore_modules:
@@ -33,7 +20,20 @@ def aggregate_code_cmd(args, _):
             nresult['names'] = aggregate_names(notebook)
         if not args.ignore_ipython:
             nresult['ipython'] = aggregate_ipython(notebook)
-    print(json.dumps(result, indent=2))
+        yield nresult
+
+
+def aggregate_code_cmd(args, _):
+    """aggregate code features cmd"""
+    if not args.notebooks:
+        notebooks = read_json()
+    else:
+        notebooks = (load(notebook) for notebook in args.notebooks)
+        args.ignore_others = None
+        args.keep = None
+        notebooks = iter_enrich_notebooks(notebooks, args)
+
+    write_json(aggregate_notebooks(notebooks, args), args)
 
 
 def create_subparsers(subparsers):
@@ -63,3 +63,4 @@ def create_subparsers(subparsers):
         "-i", "--ignore-ipython", action="store_true",
         help="Ignore IPython"
     )
+    add_jsonl_argument(parser)
@@ -1,18 +1,17 @@
 """Aggregate Markdown command: aggregate markdown features from multiple markdowns"""
 import json
-import sys
 import re
 
 from collections import defaultdict
 
 from .markdown_features_cmd import extract_features_from_args
-from ..markdown import aggregate_markdown
+from .stream import read_json, write_json, add_jsonl_argument, output_format
 
 def aggregate_markdown_cmd(args, _):
     """aggregate markdown cmd"""
+    from ..markdown import aggregate_markdown
     if not args.notebooks and not args.markdowns:
-        lines = list(sys.stdin)
-        blocks = json.loads("\n".join(lines))
+        blocks = read_json()
     else:
         blocks = extract_features_from_args("", args)
 
@@ -23,13 +22,18 @@ def aggregate_markdown_cmd(args, _):
             gname = match.group(1)
         except (IndexError, ValueError) as err:
             gname = '<default>'
-        groups[gname].append(block)
+        groups[gname].append({'features': block.get('features', {})})
 
-    result = {
-        gname: aggregate_markdown(gblocks)
-        for gname, gblocks in groups.items()
-    }
-    print(json.dumps(result, indent=2))
+    if output_format(args) != "json":
+        write_json((
+            {gname: aggregate_markdown(gblocks)}
+            for gname, gblocks in groups.items()
+        ), args)
+    else:
+        print(json.dumps({
+            gname: aggregate_markdown(gblocks)
+            for gname, gblocks in groups.items()
+        }, indent=2))
 
 
 def create_subparsers(subparsers):
@@ -55,3 +59,4 @@ def create_subparsers(subparsers):
         "-g", "--group", default=r"(.*):\d*",
         help="Group markdown blocks for aggregations"
     )
+    add_jsonl_argument(markdown_parser)
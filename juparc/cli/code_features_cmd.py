@@ -1,24 +1,25 @@
 """Code features command: extract code features from python cells"""
-import json
-import sys
-
+from .stream import read_json, write_json, add_jsonl_argument
 from ..extract import load, create_cell
-from ..code import supressed_extract_code_features, PathLocalChecker
+from ..code import supressed_extract_code_features, cell_source, local_checker
+from ..profiling import add_profile_argument, enable, stage, notebook_done
 
 
-def enrich_notebooks(notebooks, args):
-    """enrich notebooks with features"""
+def iter_enrich_notebooks(notebooks, args):
+    """enrich notebooks with features. Yields notebooks as they are enriched"""
     keep = set()
     if args.keep:
         keep = set(args.keep)
     for notebook in notebooks:
-        checker = PathLocalChecker(notebook.get('name', '.'))
+        with stage("local_checker"):
+            checker = local_checker(notebook.get('name', '.'))
         for cell in notebook.get('cells', []):
             if cell.get('cell_type', None) == 'code':
-                result = supressed_extract_code_features(
-                    cell.get("source", ""),
-                    checker
-                )
+                with stage("extract_code_features"):
+                    result = supressed_extract_code_features(
+                        cell_source(cell),
+                        checker
+                    )
                 if not args.ignore_ast:
                     keep.add('ast')
                     cell['ast'] = result['ast']
@@ -38,17 +39,27 @@ def enrich_notebooks(notebooks, args):
                 for attr in create_cell():
                     if attr not in keep and attr in cell:
                         del cell[attr]
+        notebook_done()
+        yield notebook
+
+
+def enrich_notebooks(notebooks, args):
+    """enrich notebooks with features"""
+    for _ in iter_enrich_notebooks(notebooks, args):
+        pass
+
 
 def code_features_cmd(args, _):
     """code features cmd"""
+    profiler = enable() if args.profile else None
     if not args.notebooks:
-        lines = list(sys.stdin)
-        notebooks = json.loads("\n".join(lines))
+        notebooks = read_json()
     else:
-        notebooks = [load(notebook) for notebook in args.notebooks]
+        notebooks = (load(notebook) for notebook in args.notebooks)
 
-    enrich_notebooks(notebooks, args)
-    print(json.dumps(notebooks, indent=2))
+    write_json(iter_enrich_notebooks(notebooks, args), args)
+    if profiler is not None:
+        profiler.write(args.profile)
 
 
 def create_subparsers(subparsers):
@@ -86,3 +97,5 @@ def create_subparsers(subparsers):
         "-k", "--keep", default=None, nargs="*",
         help="Keep cell attributes"
     )
+    add_profile_argument(parser)
+    add_jsonl_argument(parser)
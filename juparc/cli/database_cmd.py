@@ -0,0 +1,48 @@
+"""Database command: load notebooks into database tables"""
+import sys
+
+from .stream import read_json
+from ..database import DatabaseSink, connect
+from ..extract import load
+
+
+def database_cmd(args, _):
+    """database cmd"""
+    if not args.notebooks:
+        notebooks = read_json()
+    else:
+        notebooks = (load(notebook) for notebook in args.notebooks)
+    try:
+        connection, dialect = connect(args.database)
+    except ImportError as err:
+        sys.exit(str(err))
+    sink = DatabaseSink(connection, dialect, batch_size=args.batch_size)
+    sink.create_tables(drop=args.drop)
+    total = sink.write(notebooks)
+    connection.close()
+    print("Loaded {} notebooks into {}".format(total, args.database), file=sys.stderr)
+
+
+def create_subparsers(subparsers):
+    """create subcommands"""
+    parser = subparsers.add_parser(
+        'database',
+        help="Load notebooks into normalized database tables"
+    )
+    parser.set_defaults(func=database_cmd, command=parser)
+    parser.add_argument(
+        "database",
+        help="SQLite file (or sqlite:///file) or postgresql:// url"
+    )
+    parser.add_argument(
+        "-n", "--notebooks", default=None, nargs="*",
+        help="List of notebooks. If empty, it will read json from input"
+    )
+    parser.add_argument(
+        "-b", "--batch-size", default=1000, type=int,
+        help="Number of notebooks inserted in each transaction"
+    )
+    parser.add_argument(
+        "--drop", action="store_true",
+        help="Drop existing tables before loading"
+    )
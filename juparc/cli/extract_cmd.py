@@ -1,19 +1,117 @@
 """Extract command: extract notebooks"""
-import json
+import os
 import sys
-from ..extract import load
+
+from .stream import read_json, write_json, add_jsonl_argument, output_format
+from ..archive import expand_archives, with_member_data
+from ..dedup import DEDUP_MODES, dedup_load
+from ..extract import quiet, verbose
+from ..journal import RunJournal
+from ..manifest import Manifest, manifest_options, incremental_load
+from ..parallel import imap_load
+from ..profiling import add_profile_argument, enable
+from ..reader import READERS
+from ..words import read_words
 
 def extract_cmd(args, _):
     """extract cmd"""
-    if not args.notebooks:
-        lines = list(sys.stdin)
-        notebooks = json.loads("\n".join(lines))
-    else:
-        notebooks = args.notebooks
-    result = []
-    for notebook in notebooks:
-        result.append(load(notebook))
-    print(json.dumps(result, indent=2))
+    profiler = enable() if args.profile else None
+    notebooks = expand_archives(args.notebooks or read_json())
+    count_words = None
+    if args.count_words:
+        count_words = read_words(args.count_words)
+    # The name identifies results in journals, manifests, and duplicates.
+    # Manifests record only notebooks with ok status
+    kept = {"name", "status"} if args.manifest else {"name"}
+    include = args.include and sorted(set(args.include.split(",")) | kept)
+    exclude = args.exclude and [key for key in args.exclude.split(",") if key not in kept]
+
+    def load_unique(names):
+        """Load notebooks according to args. Archive members are read here"""
+        return imap_load(
+            with_member_data(names), jobs=args.jobs, ordered=not args.unordered,
+            chunksize=args.chunksize, cache_path=args.cache,
+            reader=args.reader, count_words=count_words,
+            include=include, exclude=exclude,
+            vprint=verbose if args.verbose else quiet,
+            cpu_limit=args.cpu_limit, max_tasks=args.max_tasks,
+            memory_limit=args.memory_limit and int(args.memory_limit * 1024 * 1024)
+        )
+
+    def load_names(names):
+        """Load notebooks according to args, deriving duplicates if args.dedup"""
+        if not args.dedup:
+            return load_unique(names)
+        return dedup_load(
+            names, load_unique, mode=args.dedup, ordered=not args.unordered,
+            count_words=count_words, include=include, exclude=exclude
+        )
+
+    if args.resume and args.dedup:
+        # Canonicals written before the interruption are not hashed again,
+        # so their duplicates would be loaded as canonicals
+        sys.exit("--resume cannot be combined with --dedup")
+    results = load_names
+    manifest = None
+    if args.manifest:
+        if args.resume:
+            sys.exit("--resume cannot be combined with --manifest")
+        previous_path = args.previous or args.output
+        manifest = Manifest(
+            args.manifest, manifest_options(count_words, include, exclude, args.reader)
+        )
+        if previous_path and os.path.exists(previous_path):
+            manifest.load()
+
+        def read_previous(names):
+            """Return {name: item} of the previous output for names"""
+            with open(previous_path, "r", encoding="utf-8") as previous_file:
+                return {
+                    item["name"]: item for item in read_json(previous_file)
+                    if item["name"] in names
+                }
+
+        def results(names):
+            """Load changed notebooks and reuse the previous output"""
+            return incremental_load(
+                names, manifest, read_previous, load_names, ordered=not args.unordered
+            )
+
+    if not args.output:
+        if args.resume:
+            sys.exit("--resume requires --output")
+        write_json(results(notebooks), args)
+        if manifest is not None:
+            manifest.save()
+        if profiler is not None:
+            profiler.write(args.profile)
+        return
+
+    journal = RunJournal(
+        args.output + ".journal", output_format(args),
+        every=args.checkpoint_every, seconds=args.checkpoint_seconds
+    )
+    if args.resume and os.path.exists(args.output):
+        journal.load()
+    # incremental_load reads the previous output before it is truncated
+    items = results(journal.skip_done(notebooks))
+    journal.open()
+    mode = "r+" if journal.offset else "w"
+    with open(args.output, mode, encoding="utf-8", newline="") as output:
+        output.seek(journal.offset)
+        output.truncate()
+        try:
+            write_json(
+                items, args, stream=output,
+                started=bool(journal.offset),
+                callback=lambda item: journal.record(item["name"], output.tell(), output)
+            )
+        finally:
+            journal.close()
+    if manifest is not None:
+        manifest.save()
+    if profiler is not None:
+        profiler.write(args.profile)
 
 def create_subparsers(subparsers):
     """create list subcommands"""
@@ -24,6 +122,94 @@ def create_subparsers(subparsers):
     extract_parser.set_defaults(func=extract_cmd, command=extract_parser)
     extract_parser.add_argument(
         "-n", "--notebooks", default=None, nargs="*",
-        help="List of notebooks. If empty, it will read from input"
+        help="List of notebooks or archives (zip and tar) with notebooks. "
+             "If empty, it will read from input"
+    )
+    extract_parser.add_argument(
+        "-j", "--jobs", default=None, type=int,
+        help="Number of worker processes. Default: number of cores"
+    )
+    extract_parser.add_argument(
+        "-u", "--unordered", action="store_true",
+        help="Output notebooks as soon as they are processed"
+    )
+    extract_parser.add_argument(
+        "--chunksize", default=8, type=int,
+        help="Number of notebooks dispatched to a worker at once"
+    )
+    extract_parser.add_argument(
+        "--cache", default=None,
+        help="SQLite file to cache results by notebook file hash"
+    )
+    extract_parser.add_argument(
+        "-r", "--reader", default="nbformat", choices=READERS,
+        help="Notebook reader. The fast reader skips nbformat validation"
+    )
+    extract_parser.add_argument(
+        "--count-words", default=None,
+        help="Vocabulary file for word_counter with one word per line. "
+             "Default: homework, assignment, course, exercise, lesson"
+    )
+    extract_parser.add_argument(
+        "--include", default=None,
+        help="Comma-separated fields to extract (e.g., language,code_cells "
+             "or cells,cells.cell_type). The name is always extracted. "
+             "Work for the other fields is skipped"
+    )
+    extract_parser.add_argument(
+        "--exclude", default=None,
+        help="Comma-separated fields that are not extracted (e.g., cells)"
+    )
+    extract_parser.add_argument(
+        "--cpu-limit", default=None, type=float,
+        help="CPU time limit per notebook in seconds. "
+             "Notebooks that exceed it get the status load-timeout"
+    )
+    extract_parser.add_argument(
+        "--memory-limit", default=None, type=float,
+        help="Worker RSS limit in MB. "
+             "Notebooks that exceed it get the status load-oom"
+    )
+    extract_parser.add_argument(
+        "--max-tasks", default=None, type=int,
+        help="Replace each worker process after this number of notebooks"
+    )
+    extract_parser.add_argument(
+        "-o", "--output", default=None,
+        help="Output file. Completed notebooks are recorded in OUTPUT.journal"
+    )
+    extract_parser.add_argument(
+        "--resume", action="store_true",
+        help="Resume an interrupted run: skip notebooks recorded in the "
+             "journal and append to the output"
+    )
+    extract_parser.add_argument(
+        "--checkpoint-every", default=1000, type=int,
+        help="Sync the output and the journal to disk after this number of notebooks"
+    )
+    extract_parser.add_argument(
+        "--checkpoint-seconds", default=10.0, type=float,
+        help="Sync the output and the journal to disk after this number of seconds"
+    )
+    extract_parser.add_argument(
+        "--dedup", default=None, nargs="?", const="reference", choices=DEDUP_MODES,
+        help="Hash all notebooks first and load only one notebook per file hash. "
+             "The others get references with the status duplicate (default) "
+             "or copies of the loaded result"
+    )
+    extract_parser.add_argument(
+        "--manifest", default=None,
+        help="Manifest file with the size, mtime, and sha1 of the notebooks of "
+             "the last run. Only new or changed notebooks are loaded"
+    )
+    extract_parser.add_argument(
+        "--previous", default=None,
+        help="Output of the last run, used with --manifest. Default: --output"
+    )
+    extract_parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help="Print cell loading messages and errors to stderr"
     )
-    
\ No newline at end of file
+    add_profile_argument(extract_parser)
+    add_jsonl_argument(extract_parser)
+    
@@ -0,0 +1,146 @@
+"""History command: extract every notebook revision of a git repository"""
+import json
+import os
+
+from .stream import read_json, write_json, add_jsonl_argument
+from ..history import walk_history, notebook_states, new_blobs, blob_tasks
+from ..extract import quiet, verbose
+from ..parallel import imap_load
+from ..reader import READERS
+from ..words import read_words
+
+
+def history_cmd(args, _):
+    """history cmd"""
+    count_words = None
+    if args.count_words:
+        count_words = read_words(args.count_words)
+    # Previous results are matched by sha1_file, and only ok ones are reused
+    kept = {"name", "sha1_file", "status"}
+    include = args.include and sorted(set(args.include.split(",")) | kept)
+    exclude = args.exclude and [key for key in args.exclude.split(",") if key not in kept]
+    refs = ["--all"] if args.all else args.refs or ["HEAD"]
+    revisions = list(walk_history(args.repo, refs, args.notebooks))
+
+    with open(args.revisions, "w", encoding="utf-8") as output:
+        for revision, notebooks in notebook_states(revisions):
+            if args.full:
+                revision = dict(revision, notebooks=notebooks)
+            output.write(json.dumps(revision) + "\n")
+
+    previous = {}
+    if args.previous and os.path.exists(args.previous):
+        with open(args.previous, "r", encoding="utf-8") as previous_file:
+            previous = {
+                item["sha1_file"]: item for item in read_json(previous_file)
+                if item.get("status") == "ok"
+            }
+
+    loaded = imap_load(
+        blob_tasks(args.repo, new_blobs(args.repo, revisions, previous)),
+        jobs=args.jobs, ordered=True, chunksize=args.chunksize,
+        cache_path=args.cache, reader=args.reader, count_words=count_words,
+        include=include, exclude=exclude,
+        vprint=verbose if args.verbose else quiet,
+        cpu_limit=args.cpu_limit, max_tasks=args.max_tasks,
+        memory_limit=args.memory_limit and int(args.memory_limit * 1024 * 1024)
+    )
+
+    def results():
+        """Yield previous results of known blobs and load the new ones"""
+        for _, blob in new_blobs(args.repo, revisions):
+            yield previous[blob] if blob in previous else next(loaded)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            write_json(results(), args, stream=output)
+    else:
+        write_json(results(), args)
+
+
+def create_subparsers(subparsers):
+    """create history subcommands"""
+    history_parser = subparsers.add_parser(
+        'history',
+        help="Extract each notebook revision of a git repository once"
+    )
+    history_parser.set_defaults(func=history_cmd, command=history_parser)
+    history_parser.add_argument("repo", help="Local git repository (bare or not)")
+    history_parser.add_argument(
+        "--refs", default=None, nargs="*",
+        help="Refs whose history is walked. Default: HEAD"
+    )
+    history_parser.add_argument(
+        "--all", action="store_true",
+        help="Walk the history of all refs"
+    )
+    history_parser.add_argument(
+        "-m", "--revisions", required=True,
+        help="Output file with one JSON line per commit: its parents, time, "
+             "and the notebooks it added or changed (path: blob id) "
+             "or deleted (path: null)"
+    )
+    history_parser.add_argument(
+        "--full", action="store_true",
+        help="Write all notebooks of each commit to --revisions, "
+             "instead of only the changed ones"
+    )
+    history_parser.add_argument("-n", "--notebooks", default="**/*.ipynb",
+                                help="Glob to find notebooks")
+    history_parser.add_argument(
+        "--previous", default=None,
+        help="Output of a previous history run. Blobs in it are not extracted again"
+    )
+    history_parser.add_argument(
+        "-j", "--jobs", default=None, type=int,
+        help="Number of worker processes. Default: number of cores"
+    )
+    history_parser.add_argument(
+        "--chunksize", default=8, type=int,
+        help="Number of notebooks dispatched to a worker at once"
+    )
+    history_parser.add_argument(
+        "--cache", default=None,
+        help="SQLite file to cache results by notebook file hash (blob id)"
+    )
+    history_parser.add_argument(
+        "-r", "--reader", default="nbformat", choices=READERS,
+        help="Notebook reader. The fast reader skips nbformat validation"
+    )
+    history_parser.add_argument(
+        "--count-words", default=None,
+        help="Vocabulary file for word_counter with one word per line. "
+             "Default: homework, assignment, course, exercise, lesson"
+    )
+    history_parser.add_argument(
+        "--include", default=None,
+        help="Comma-separated fields to extract (e.g., language,code_cells). "
+             "The name, sha1_file, and status are always extracted"
+    )
+    history_parser.add_argument(
+        "--exclude", default=None,
+        help="Comma-separated fields that are not extracted (e.g., cells)"
+    )
+    history_parser.add_argument(
+        "--cpu-limit", default=None, type=float,
+        help="CPU time limit per notebook in seconds. "
+             "Notebooks that exceed it get the status load-timeout"
+    )
+    history_parser.add_argument(
+        "--memory-limit", default=None, type=float,
+        help="Worker RSS limit in MB. "
+             "Notebooks that exceed it get the status load-oom"
+    )
+    history_parser.add_argument(
+        "--max-tasks", default=None, type=int,
+        help="Replace each worker process after this number of notebooks"
+    )
+    history_parser.add_argument(
+        "-o", "--output", default=None,
+        help="Output file with one extracted notebook per blob. Default: stdout"
+    )
+    history_parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help="Print cell loading messages and errors to stderr"
+    )
+    add_jsonl_argument(history_parser)
@@ -2,10 +2,23 @@
 import glob
 import json
 
+from .stream import write_json, add_jsonl_argument, output_format
+from ..archive import list_members
+
 
 def list_cmd(args, _):
     """list cmd"""
-    print(json.dumps(sorted(glob.glob(args.notebooks, recursive=True))))
+    if args.archives:
+        notebooks = [
+            name for archive in args.archives
+            for name in list_members(archive, args.notebooks)
+        ]
+    else:
+        notebooks = sorted(glob.glob(args.notebooks, recursive=True))
+    if output_format(args) != "json":
+        write_json(notebooks, args)
+    else:
+        print(json.dumps(notebooks))
 
 
 def create_subparsers(subparsers):
@@ -17,3 +30,8 @@ def create_subparsers(subparsers):
     list_parser.set_defaults(func=list_cmd, command=list_parser)
     list_parser.add_argument("-n", "--notebooks", default="**/*.ipynb",
                              help="Glob to find notebooks")
+    list_parser.add_argument("-a", "--archives", default=None, nargs="*",
+                             help="Find notebooks in zip or tar archives or in git "
+                                  "trees (REPO@REF) instead of the directory. Names "
+                                  "are ARCHIVE!/PATH, in the archive order")
+    add_jsonl_argument(list_parser)
@@ -2,14 +2,23 @@
 import glob
 import json
 
+from ..archive import list_members
+
+
+def find_files(pattern, archives):
+    """Find files that match glob pattern in the directory or in the archives"""
+    if archives:
+        return [name for archive in archives for name in list_members(archive, pattern)]
+    return glob.glob(pattern, recursive=True)
+
 
 def listreq_cmd(args, _):
     """listreq function"""
     print(json.dumps({
-        'setup.py': glob.glob(args.setup, recursive=True),
-        'requirements.txt': glob.glob(args.requirements, recursive=True),
-        'Pipfile': glob.glob(args.pipfile, recursive=True),
-        'Pipfile.lock': glob.glob(args.pipfile_lock, recursive=True)
+        'setup.py': find_files(args.setup, args.archives),
+        'requirements.txt': find_files(args.requirements, args.archives),
+        'Pipfile': find_files(args.pipfile, args.archives),
+        'Pipfile.lock': find_files(args.pipfile_lock, args.archives)
     }))
 
 
@@ -28,3 +37,7 @@ def create_subparsers(subparsers):
                              help="Glob to find Pipfile files")
     list_parser.add_argument("-l", "--pipfile-lock", default="**/Pipfile.lock",
                              help="Glob to find Pipfile.lock files")
+    list_parser.add_argument("-a", "--archives", default=None, nargs="*",
+                             help="Find files in zip or tar archives or in git trees "
+                                  "(REPO@REF) instead of the directory. Names are "
+                                  "ARCHIVE!/PATH")
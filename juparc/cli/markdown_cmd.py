@@ -1,21 +1,20 @@
 """Markdown command: extract markdown cells from notebooks"""
-import json
 import sys
+from .stream import read_json
 from ..extract import load
-from ..markdown import generate_markdown_cells
 
 def markdown_cmd(args, _):
     """markdown cmd"""
+    from ..markdown import generate_markdown_cells
     if not args.notebooks:
-        lines = list(sys.stdin)
-        notebooks = json.loads("\n".join(lines))
+        notebooks = read_json()
     else:
-        notebooks = [load(notebook) for notebook in args.notebooks]
+        notebooks = (load(notebook) for notebook in args.notebooks)
 
-    result = []
     for notebook in notebooks:
-        result.extend(generate_markdown_cells(notebook, args.pattern))
-    print(''.join(result))
+        for markdown in generate_markdown_cells(notebook, args.pattern):
+            sys.stdout.write(markdown)
+    sys.stdout.write('\n')
 
 
 def create_subparsers(subparsers):
@@ -1,41 +1,41 @@
 """Markdown Features command: extract features from markdown"""
-import json
 import sys
+from .stream import write_json, add_jsonl_argument
 from ..extract import load
-from ..markdown import generate_markdown_cells, split_markdown, extract_features
 
-def extract_features_from_args(markdown, args):
-    """extract markdown features according to args"""
+def markdown_from_args(markdown, args):
+    """generate markdown chunks according to args"""
+    from ..markdown import generate_markdown_cells
+    for chunk in markdown:
+        yield chunk
+
     if args.notebooks:
-        markdown_l = []
         for notebook in args.notebooks:
-            markdown_l.extend(generate_markdown_cells(
-                load(notebook), args.pattern
-            ))
-        markdown += ''.join(markdown_l)
+            for chunk in generate_markdown_cells(load(notebook), args.pattern):
+                yield chunk
 
     if args.markdowns:
         for mark in args.markdowns:
             with open(mark, 'r') as fil:
-                markdown += (
-                    args.pattern.format(mark)
-                    + fil.read()
-                )
+                yield args.pattern.format(mark) + fil.read()
 
-    blocks = split_markdown(markdown, args.pattern)
+
+def extract_features_from_args(markdown, args):
+    """extract markdown features according to args. Yields blocks"""
+    from ..markdown import iter_split_markdown, extract_features
+    blocks = iter_split_markdown(markdown_from_args(markdown, args), args.pattern)
     for block in blocks:
         block['features'] = extract_features(block['code'])
-    return blocks
+        yield block
 
 def markdown_features_cmd(args, _):
     """markdown features cmd"""
     markdown = ""
     if not args.notebooks and not args.markdowns:
-        lines = list(sys.stdin)
-        markdown = "".join(lines)
+        markdown = sys.stdin
 
     blocks = extract_features_from_args(markdown, args)
-    print(json.dumps(blocks, indent=2))
+    write_json(blocks, args)
 
 
 def create_subparsers(subparsers):
@@ -57,3 +57,4 @@ def create_subparsers(subparsers):
         "-p", "--pattern", default="\n\n###### <juparc:{}> ######\n\n",
         help="Header to indicate te start of a Markdown cells"
     )
+    add_jsonl_argument(markdown_parser)
@@ -0,0 +1,55 @@
+"""Metrics command: recompute execution order metrics of extracted notebooks"""
+from itertools import islice
+
+from .stream import read_json, write_json, add_jsonl_argument
+
+
+def iter_batches(iterable, size):
+    """Split iterable into lists of size elements"""
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def recompute_notebooks(notebooks, args):
+    """Recompute metrics of notebooks in batches. Yields notebooks
+
+    Notebooks without computed metrics (e.g., load errors) are not changed
+    """
+    from ..extract import extracted_code_cells
+    from ..metrics import encode, compute, to_rows
+    for batch in iter_batches(notebooks, args.batch_size):
+        selected = [nb for nb in batch if nb.get("unordered") is not None]
+        matrix = compute(
+            *encode(extracted_code_cells(nb) for nb in selected),
+            engine=args.engine
+        )
+        for notebook, metrics in zip(selected, to_rows(matrix)):
+            notebook.update(metrics)
+        for notebook in batch:
+            yield notebook
+
+
+def metrics_cmd(args, _):
+    """metrics cmd"""
+    write_json(recompute_notebooks(read_json(records=True), args), args)
+
+
+def create_subparsers(subparsers):
+    """create metrics subcommands"""
+    parser = subparsers.add_parser(
+        'metrics',
+        help="Recompute execution order metrics of extracted notebooks"
+    )
+    parser.set_defaults(func=metrics_cmd, command=parser)
+    parser.add_argument(
+        "-b", "--batch-size", default=100000, type=int,
+        help="Number of notebooks computed at once"
+    )
+    parser.add_argument(
+        "-e", "--engine", default="auto", choices=["auto", "numpy", "numba"],
+        help="Metrics engine. auto uses numba, if it is installed"
+    )
+    add_jsonl_argument(parser)
@@ -0,0 +1,51 @@
+"""Parquet command: export notebooks and cells as Parquet datasets"""
+import sys
+
+from .stream import read_json
+from ..extract import load
+
+
+def parquet_cmd(args, _):
+    """parquet cmd"""
+    from ..parquet import write_parquet  # imports pyarrow
+    if not args.notebooks:
+        notebooks = read_json()
+    else:
+        notebooks = (load(notebook) for notebook in args.notebooks)
+    try:
+        total = write_parquet(
+            notebooks, args.output, batch_size=args.batch_size,
+            partition_by=args.partition_by, cells=not args.ignore_cells
+        )
+    except (ImportError, FileExistsError) as err:
+        sys.exit(str(err))
+    print("Exported {} notebooks to {}".format(total, args.output), file=sys.stderr)
+
+
+def create_subparsers(subparsers):
+    """create subcommands"""
+    parser = subparsers.add_parser(
+        'parquet',
+        help="Export notebooks and cells as partitioned Parquet tables"
+    )
+    parser.set_defaults(func=parquet_cmd, command=parser)
+    parser.add_argument(
+        "-n", "--notebooks", default=None, nargs="*",
+        help="List of notebooks. If empty, it will read json from input"
+    )
+    parser.add_argument(
+        "-o", "--output", required=True,
+        help="Output directory. Tables are written to OUTPUT/notebooks and OUTPUT/cells"
+    )
+    parser.add_argument(
+        "-b", "--batch-size", default=10000, type=int,
+        help="Number of notebooks converted and written at once"
+    )
+    parser.add_argument(
+        "-p", "--partition-by", default=None, nargs="*",
+        help="Partition columns. Default: language kernel"
+    )
+    parser.add_argument(
+        "--ignore-cells", action="store_true",
+        help="Do not write the cells table"
+    )
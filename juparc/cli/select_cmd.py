@@ -1,8 +1,9 @@
 """Select command: select notebooks"""
 import json
-import sys
 import re
+from .stream import read_json, write_json, add_jsonl_argument
 from ..extract import load, create_default
+from ..records import json_default
 
 def value(original):
     """Convert value to int, float, tuple or str"""
@@ -21,7 +22,7 @@ def value(original):
                     except ValueError:
                         pass
         return original
-    return json.dumps(original)
+    return json.dumps(original, default=json_default)
 
 
 def compare(notebook_arg, attr):
@@ -44,17 +45,9 @@ def compare(notebook_arg, attr):
     return re.match(attr, str(nval)) is not None
 
 
-def select_cmd(args, _):
-    """select cmd"""
-    if not args.notebooks:
-        lines = list(sys.stdin)
-        notebooks = json.loads("\n".join(lines))
-    else:
-        notebooks = [load(notebook) for notebook in args.notebooks]
-
+def select_notebooks(notebooks, args):
+    """Select notebooks that match args conditions. Yields selected notebooks"""
     attributes = create_default()
-
-    result = []
     for notebook in notebooks:
         add = True
         for arg in attributes:
@@ -66,12 +59,21 @@ def select_cmd(args, _):
                 add = False
                 continue
         if add:
-            result.append(notebook)
+            yield notebook
+
+
+def select_cmd(args, _):
+    """select cmd"""
+    if not args.notebooks:
+        notebooks = read_json()
+    else:
+        notebooks = (load(notebook) for notebook in args.notebooks)
 
+    result = select_notebooks(notebooks, args)
     if args.count:
-        print(len(result))
+        print(sum(1 for _ in result))
     else:
-        print(json.dumps(result, indent=2))
+        write_json(result, args)
 
 
 def create_subparsers(
@@ -91,6 +93,7 @@ def create_subparsers(
         "-c", "--count", action="store_true",
         help="Show count instead of notebooks"
     )
+    add_jsonl_argument(parser)
 
     attributes = create_default()
     for attr in attributes:
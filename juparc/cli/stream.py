@@ -0,0 +1,173 @@
+"""Stream helpers: read and write JSON lists, JSON Lines, or MessagePack
+
+Output formats (--format):
+  json: indented JSON list (default)
+  jsonl: JSON Lines, one compact item per line (same as --jsonl)
+  orjson: JSON Lines encoded with orjson (faster, requires orjson)
+  msgpack: stream of MessagePack items (fastest, requires msgpack)
+Readers detect the format of the input. JSON is decoded with orjson, if
+it is installed
+"""
+import json
+import sys
+
+from functools import partial
+
+from ..records import json_default, record_hook
+
+FORMATS = ["json", "jsonl", "orjson", "msgpack"]
+
+# First bytes of JSON texts. MessagePack maps, arrays, and strings start
+# with other bytes
+JSON_START = b' \t\r\n[{"-0123456789tfn'
+
+
+def import_orjson():
+    """Return orjson module or None if it is not installed. Imported on the first use"""
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+def fast_loads(data):
+    """Decode JSON with orjson. Falls back to json for values it rejects (e.g., NaN)"""
+    orjson = import_orjson()
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return json.loads(data)
+
+
+def is_msgpack(head):
+    """Check if the first bytes of a stream are MessagePack"""
+    head = head.lstrip()
+    return bool(head) and head[0] not in JSON_START
+
+
+def read_msgpack(stream, records=False):
+    """Read MessagePack items from binary stream. Yields items"""
+    try:
+        import msgpack
+    except ImportError:
+        raise ImportError("MessagePack input requires msgpack (pip install msgpack)")
+    unpacker = msgpack.Unpacker(
+        stream, raw=False, strict_map_key=False,
+        object_hook=record_hook if records else None
+    )
+    for item in unpacker:
+        yield item
+
+
+def read_json(stream=None, records=False):
+    """Read a JSON list, JSON Lines, or MessagePack from stream. Yields items
+
+    The format is detected by the first bytes: MessagePack items do not
+    start like JSON, and a first non-blank line starting with '[' indicates
+    a JSON list. Use records=True to load notebooks and cells as compact
+    records
+    """
+    stream = stream or sys.stdin
+    binary = getattr(stream, "buffer", stream)
+    if not hasattr(binary, "peek"):
+        binary = stream
+    elif is_msgpack(binary.peek(64)):
+        yield from read_msgpack(binary, records)
+        return
+    if records:
+        loads = partial(json.loads, object_hook=record_hook)
+    else:
+        loads = json.loads if import_orjson() is None else fast_loads
+    lines = iter(binary)
+    for line in lines:
+        if not line.strip():
+            continue
+        if line.lstrip()[:1] in ("[", b"["):
+            rest = [line]
+            rest.extend(lines)
+            for item in loads(line[:0].join(rest)):
+                yield item
+            return
+        yield loads(line)
+        break
+    for line in lines:
+        if line.strip():
+            yield loads(line)
+
+
+def output_format(args):
+    """Return output format of args. --jsonl is the same as --format jsonl"""
+    if getattr(args, "format", None):
+        return args.format
+    return "jsonl" if getattr(args, "jsonl", False) else "json"
+
+
+def binary_encoder(output):
+    """Return function that encodes an item to bytes in output format"""
+    if output == "orjson":
+        orjson = import_orjson()
+        if orjson is None:
+            raise ImportError("The orjson format requires orjson (pip install orjson)")
+        return partial(
+            orjson.dumps, default=json_default,
+            option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS
+        )
+    try:
+        import msgpack
+    except ImportError:
+        raise ImportError("The msgpack format requires msgpack (pip install msgpack)")
+    return msgpack.Packer(default=json_default).pack
+
+
+def write_json(items, args, stream=None, started=False, callback=None):
+    """Write items as they are produced
+
+    Writes the output format of args (see output_format). The json format
+    is the same indented JSON list as json.dumps(list(items), indent=2).
+    Use started=True to continue a JSON list that already has items.
+    If callback is set, the stream is flushed and callback(item) is
+    called after writing each item
+    """
+    stream = stream or sys.stdout
+    output = output_format(args)
+    if output in ("orjson", "msgpack"):
+        encode = binary_encoder(output)
+        stream.flush()
+        binary = getattr(stream, "buffer", stream)
+        for item in items:
+            binary.write(encode(item))
+            if callback is not None:
+                binary.flush()
+                callback(item)
+        binary.flush()
+        return
+    if output == "jsonl":
+        for item in items:
+            stream.write(json.dumps(item, default=json_default) + "\n")
+            stream.flush()
+            if callback is not None:
+                callback(item)
+        return
+    separator = ",\n  " if started else "[\n  "
+    for item in items:
+        stream.write(separator + json.dumps(item, indent=2, default=json_default).replace("\n", "\n  "))
+        separator = ",\n  "
+        if callback is not None:
+            stream.flush()
+            callback(item)
+    stream.write("[]\n" if separator == "[\n  " else "\n]\n")
+
+
+def add_jsonl_argument(parser):
+    """Add --jsonl and --format arguments to parser"""
+    parser.add_argument(
+        "--jsonl", action="store_true",
+        help="Output JSON Lines (one item per line) instead of a JSON list"
+    )
+    parser.add_argument(
+        "--format", default=None, choices=FORMATS,
+        help="Output format: json (indented list, default), jsonl, orjson "
+             "(JSON Lines encoded with orjson), or msgpack. "
+             "Readers detect the format"
+    )
@@ -8,6 +8,8 @@ import sys
 from collections import Counter, defaultdict, OrderedDict
 from contextlib import contextmanager
 
+from .archive import is_member, member_files, member_paths
+from .transform import transform_cell
 from .utils import to_unicode
 
 AST_CUSTOM = [
@@ -162,6 +164,36 @@ class PathLocalChecker(object):
                         return value
         return 0
 
+
+class ArchiveLocalChecker(PathLocalChecker):
+    """Check if module is local by looking at the archive members
+
+    Paths are ARCHIVE!/PATH names, as the notebook names
+    """
+
+    def __init__(self, path):
+        super(ArchiveLocalChecker, self).__init__(path)
+        self.paths = member_paths(path)
+
+    def exists(self, path):
+        """Check if path exists in the archive"""
+        return path in self.paths
+
+    def iterate_files(self):
+        """Iterate on repository files"""
+        prefix = self.base + "/"
+        for name in member_files(prefix):
+            if name.startswith(prefix):
+                yield name.rsplit("/", 1)[-1]
+
+
+def local_checker(path):
+    """Create local checker for notebook path"""
+    if is_member(path):
+        return ArchiveLocalChecker(path)
+    return PathLocalChecker(path)
+
+
 class CellVisitor(ast.NodeVisitor):
     """Visit cell ast to extract data"""
     # pylint: disable=invalid-name
@@ -490,6 +522,21 @@ def extract_code_features(text, checker):
     }
 
 
+def cell_source(cell):
+    """Return python source of cell
+
+    Transforms the IPython syntax of raw_source if the source was not extracted.
+    As in extract, cells with transformation errors have empty source
+    """
+    source = cell.get("source")
+    if source is None:
+        try:
+            source = transform_cell(cell.get("raw_source") or "")
+        except SyntaxError:
+            source = ""
+    return source
+
+
 def supressed_extract_code_features(source, checker):
     """Extract code features but suppress syntax errors"""
     try:
@@ -0,0 +1,292 @@
+"""Database sink: load extracted notebooks into normalized SQL tables
+
+Notebooks are split into the tables notebooks, cells, modules,
+ipython_features, and names. Rows are buffered and inserted in batches,
+with one transaction per batch. SQLite uses executemany over multi-row
+INSERT statements. PostgreSQL (psycopg2) uses COPY FROM STDIN
+"""
+import io
+import json
+import sqlite3
+
+from .extract import create_default, create_cell, int_or_none
+
+# (table, column) of values stored as JSON text. The status of notebooks
+# is a plain string, but the status of cells is a list
+JSON_COLUMNS = {
+    ("notebooks", "word_counter"),
+    ("cells", "output_formats"),
+    ("cells", "status"),
+}
+
+BOOLEAN_COLUMNS = {"unambiguous", "unordered", "python", "local"}
+
+INTEGER_COLUMNS = {"size", "index", "execution_count", "lines"}
+
+# Maximum number of parameters of a single SQLite statement
+SQLITE_MAX_PARAMETERS = 999
+
+
+def column_type(table, key, value):
+    """Return SQL type of a create_default or create_cell column of table"""
+    if (table, key) in JSON_COLUMNS or key == "nbformat":
+        return "TEXT"
+    if key in BOOLEAN_COLUMNS:
+        return "BOOLEAN"
+    if key in INTEGER_COLUMNS or isinstance(value, int):
+        return "BIGINT"
+    return "TEXT"
+
+
+def table_columns():
+    """Return dict of table name to list of (column, SQL type)"""
+    notebook_columns = [("id", "BIGINT")]
+    notebook_columns.extend(
+        (key, column_type("notebooks", key, value))
+        for key, value in create_default().items() if key != "cells"
+    )
+    notebook_columns.append(("duplicate_of", "TEXT"))
+    cell_columns = [("notebook_id", "BIGINT")]
+    cell_columns.extend(
+        (key, column_type("cells", key, value)) for key, value in create_cell().items()
+    )
+    return {
+        "notebooks": notebook_columns,
+        "cells": cell_columns,
+        "modules": [
+            ("notebook_id", "BIGINT"), ("cell_index", "BIGINT"), ("line", "BIGINT"),
+            ("import_type", "TEXT"), ("name", "TEXT"), ("local", "BOOLEAN"),
+            ("local_possibility", "BIGINT"),
+        ],
+        "ipython_features": [
+            ("notebook_id", "BIGINT"), ("cell_index", "BIGINT"), ("line", "BIGINT"),
+            ("column", "BIGINT"), ("feature_name", "TEXT"), ("feature_value", "TEXT"),
+        ],
+        "names": [
+            ("notebook_id", "BIGINT"), ("cell_index", "BIGINT"), ("scope", "TEXT"),
+            ("context", "TEXT"), ("name", "TEXT"), ("count", "BIGINT"),
+        ],
+    }
+
+
+PRIMARY_KEYS = {
+    "notebooks": ["id"],
+    "cells": ["notebook_id", "index"],
+}
+
+TABLES = table_columns()
+
+
+def quote(identifier):
+    """Quote SQL identifier"""
+    return '"{}"'.format(identifier)
+
+
+def create_table_sql(table):
+    """Return CREATE TABLE statement of table"""
+    definitions = ["{} {}".format(quote(column), sql_type) for column, sql_type in TABLES[table]]
+    if table in PRIMARY_KEYS:
+        definitions.append("PRIMARY KEY ({})".format(
+            ", ".join(quote(column) for column in PRIMARY_KEYS[table])
+        ))
+    return "CREATE TABLE IF NOT EXISTS {} ({})".format(quote(table), ", ".join(definitions))
+
+
+def json_value(value):
+    """Convert value to JSON text"""
+    return None if value is None else json.dumps(value)
+
+
+def unambiguous_value(value):
+    """Convert unambiguous to boolean. Notebooks without counts ([]) are NULL"""
+    return None if value is None or value == [] else bool(value)
+
+
+def nbformat_value(value):
+    """Convert nbformat to text"""
+    return None if value is None else str(value)
+
+
+def converters(table):
+    """Return list of (column, function) that convert JSON values to table columns
+
+    The function is None for values that are stored as they are
+    """
+    special = {
+        "unambiguous": unambiguous_value,
+        "execution_count": int_or_none,
+        "nbformat": nbformat_value,
+    }
+    return [
+        (column, json_value if (table, column) in JSON_COLUMNS else special.get(column))
+        for column, _ in TABLES[table]
+    ]
+
+
+# Converters of the notebooks and cells columns, except id and notebook_id
+NOTEBOOK_CONVERTERS = converters("notebooks")[1:]
+CELL_CONVERTERS = converters("cells")[1:]
+
+
+def convert_row(item, row_converters):
+    """Convert dict to list of column values"""
+    get = item.get
+    return [
+        get(column) if convert is None else convert(get(column))
+        for column, convert in row_converters
+    ]
+
+
+def notebook_rows(notebook_id, notebook):
+    """Generate (table, row) tuples of extracted notebook"""
+    yield "notebooks", tuple([notebook_id] + convert_row(notebook, NOTEBOOK_CONVERTERS))
+    for cell in notebook.get("cells") or []:
+        index = cell.get("index")
+        yield "cells", tuple([notebook_id] + convert_row(cell, CELL_CONVERTERS))
+        modules = cell.get("modules")
+        if isinstance(modules, list):
+            for module in modules:
+                yield "modules", (
+                    notebook_id, index, module.get("line"), module.get("import_type"),
+                    module.get("name"), module.get("local"), module.get("local_possibility"),
+                )
+        features = cell.get("ipython")
+        if isinstance(features, list):
+            for feature in features:
+                yield "ipython_features", (
+                    notebook_id, index, feature.get("line"), feature.get("column"),
+                    feature.get("feature_name"), feature.get("feature_value"),
+                )
+        names = cell.get("names")
+        if isinstance(names, dict):
+            for scope, contexts in names.items():
+                for context, counter in contexts.items():
+                    for name, count in counter.items():
+                        yield "names", (notebook_id, index, scope, context, name, count)
+
+
+def csv_value(value):
+    """Convert value to PostgreSQL CSV field. None is an unquoted empty field"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    return str(value)
+
+
+def connect(url):
+    """Connect to database url. Returns (connection, dialect)
+
+    postgresql:// urls require psycopg2. Other urls are SQLite files,
+    optionally with the sqlite:/// prefix
+    """
+    if url.startswith(("postgresql://", "postgresql+psycopg2://", "postgres://")):
+        try:
+            import psycopg2
+        except ImportError:
+            raise ImportError("PostgreSQL requires psycopg2 (pip install psycopg2)")
+        return psycopg2.connect(url.replace("+psycopg2", "", 1)), "postgresql"
+    if url.startswith("sqlite:///"):
+        url = url[10:]
+    connection = sqlite3.connect(url)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection, "sqlite"
+
+
+class DatabaseSink(object):
+    """Write extracted notebooks to the database tables in batches
+
+    Rows of batch_size notebooks are buffered and inserted in a single
+    transaction. Notebook ids continue from the largest id in the table
+    """
+
+    def __init__(self, connection, dialect="sqlite", batch_size=1000):
+        self.connection = connection
+        self.dialect = dialect
+        self.batch_size = batch_size
+        self.buffer = {table: [] for table in TABLES}
+        self.pending = 0
+        self.next_id = None
+
+    def create_tables(self, drop=False):
+        """Create tables if they do not exist. Use drop to recreate them"""
+        cursor = self.connection.cursor()
+        for table in TABLES:
+            if drop:
+                cursor.execute("DROP TABLE IF EXISTS {}".format(quote(table)))
+            cursor.execute(create_table_sql(table))
+        self.connection.commit()
+        cursor.execute("SELECT MAX(id) FROM notebooks")
+        self.next_id = (cursor.fetchone()[0] or 0) + 1
+
+    def add(self, notebook):
+        """Add notebook to the buffer. Flushes full batches"""
+        for table, row in notebook_rows(self.next_id, notebook):
+            self.buffer[table].append(row)
+        self.next_id += 1
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Insert buffered rows in a single transaction"""
+        cursor = self.connection.cursor()
+        for table, rows in self.buffer.items():
+            if not rows:
+                continue
+            if self.dialect == "postgresql":
+                self.copy_rows(cursor, table, rows)
+            else:
+                self.insert_rows(cursor, table, rows)
+            rows.clear()
+        self.connection.commit()
+        self.pending = 0
+
+    def insert_rows(self, cursor, table, rows):
+        """Insert rows with multi-row INSERT statements"""
+        columns = TABLES[table]
+        per_statement = max(1, SQLITE_MAX_PARAMETERS // len(columns))
+        row_sql = "(" + ", ".join("?" for _ in columns) + ")"
+        insert = "INSERT INTO {} ({}) VALUES ".format(
+            quote(table), ", ".join(quote(column) for column, _ in columns)
+        )
+        full = len(rows) - len(rows) % per_statement
+        if full:
+            cursor.executemany(
+                insert + ", ".join([row_sql] * per_statement),
+                (
+                    [value for row in rows[start:start + per_statement] for value in row]
+                    for start in range(0, full, per_statement)
+                )
+            )
+        if full < len(rows):
+            cursor.execute(
+                insert + ", ".join([row_sql] * (len(rows) - full)),
+                [value for row in rows[full:] for value in row]
+            )
+
+    def copy_rows(self, cursor, table, rows):
+        """Load rows with PostgreSQL COPY FROM STDIN in CSV format
+
+        Strings are quoted and None is unquoted, so COPY distinguishes
+        empty strings from NULL
+        """
+        data = io.StringIO()
+        for row in rows:
+            data.write(",".join(map(csv_value, row)) + "\n")
+        data.seek(0)
+        cursor.copy_expert("COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+            quote(table), ", ".join(quote(column) for column, _ in TABLES[table])
+        ), data)
+
+    def write(self, notebooks):
+        """Write notebooks. Returns the number of notebooks"""
+        total = 0
+        for notebook in notebooks:
+            self.add(notebook)
+            total += 1
+        self.flush()
+        return total
@@ -0,0 +1,103 @@
+"""Duplicate-aware extraction: load one notebook per file hash"""
+from concurrent.futures import ThreadPoolExecutor
+
+from .extract import create_default, remove_filtered, rename_word_counter, sha1_hash
+
+DEDUP_MODES = ["reference", "copy"]
+
+
+def try_sha1_hash(path):
+    """Return sha1 of file or None if it cannot be read"""
+    try:
+        return sha1_hash(path)
+    except OSError:
+        return None
+
+
+def hash_files(names, jobs=None):
+    """Hash files with a pool of threads. Returns list of sha1 (or None)
+
+    hashlib releases the GIL while hashing, so threads hash files in parallel
+    """
+    with ThreadPoolExecutor(jobs) as executor:
+        return list(executor.map(try_sha1_hash, names))
+
+
+def duplicate_result(name, canonical, mode="reference", count_words=None, include=None, exclude=None):
+    """Create result of notebook that is a duplicate of canonical result
+
+    The reference mode creates a default notebook with the status duplicate
+    and duplicate_of set to the canonical name. The copy mode copies the
+    canonical result with the new name, as if the notebook was loaded.
+    References keep only the fields of include/exclude and duplicate_of
+    """
+    if mode == "copy":
+        result = dict(canonical)
+        if "word_counter" in result:
+            result["word_counter"] = rename_word_counter(
+                result["word_counter"], canonical["name"], name, count_words
+            )
+        result["name"] = name
+        return result
+    result = create_default(name)
+    result["size"] = canonical.get("size")
+    result["sha1_file"] = canonical.get("sha1_file")
+    result["status"] = "duplicate"
+    result = remove_filtered(result, include, exclude)
+    result["duplicate_of"] = canonical["name"]
+    return result
+
+
+def dedup_load(
+        names, load_names, mode="reference", ordered=True, jobs=None, count_words=None,
+        include=None, exclude=None
+):
+    """Load one notebook per file hash and derive the results of duplicates
+
+    Files are hashed first. The first notebook of each hash is loaded with
+    load_names, a function that receives a list of names and yields their
+    results (in the same order, if ordered). The other notebooks with the
+    same hash get duplicate results (see duplicate_result) with the fields
+    of include/exclude. Files that cannot be hashed are loaded.
+    Canonical results are kept only until their last duplicate is emitted
+    """
+    names = list(names)
+    hashes = hash_files(names, jobs)
+    canonical = {}
+    duplicates = {}
+    unique = []
+    for name, digest in zip(names, hashes):
+        if digest is not None and digest in canonical:
+            duplicates.setdefault(digest, []).append(name)
+        else:
+            if digest is not None:
+                canonical[digest] = name
+            unique.append((name, digest))
+
+    loaded = load_names([name for name, _ in unique])
+    if ordered:
+        canonical_results = {}
+        pending = {digest: len(others) for digest, others in duplicates.items()}
+        for name, digest in zip(names, hashes):
+            if digest in canonical_results:
+                canonical_result = canonical_results[digest]
+                pending[digest] -= 1
+                if not pending[digest]:
+                    del canonical_results[digest]
+                yield duplicate_result(
+                    name, canonical_result, mode, count_words, include, exclude
+                )
+                continue
+            result = next(loaded)
+            if digest in duplicates:
+                canonical_results[digest] = result
+            yield result
+        return
+    digests = {}
+    for name, digest in unique:
+        digests.setdefault(name, []).append(digest)
+    for result in loaded:
+        yield result
+        digest = digests[result["name"]].pop()
+        for name in duplicates.get(digest, ()):
+            yield duplicate_result(name, result, mode, count_words, include, exclude)
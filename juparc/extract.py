@@ -2,18 +2,40 @@
 import hashlib
 import os
 import re
+import sys
 import traceback
 
 from collections import Counter
 
-import numba
-import numpy
-import nbformat as nbf
-from IPython.core.interactiveshell import InteractiveShell
+from .archive import check_archive, is_archive, is_member, member_hash, read_member
+from .profiling import stage
+from .reader import read_notebook, read_stream, convert_notebook
+from .records import NotebookRecord, CellRecord, NOTEBOOK_FIELDS, CELL_FIELDS
+from .transform import transform_cell
+from .words import get_matcher
 
 COUNT_WORDS = ['homework', 'assignment', 'course', 'exercise', 'lesson']
 
 
+def quiet(_):
+    """Default vprint: ignore messages"""
+
+
+def verbose(message):
+    """vprint that writes messages to stderr"""
+    sys.stderr.write(message + "\n")
+
+
+def vlog(vprint, message, *args):
+    """Call vprint with message formatted with args
+
+    Messages for quiet are not formatted, so quiet runs do not pay for it.
+    Callable args (e.g., traceback.format_exc) are called first
+    """
+    if vprint is not quiet:
+        vprint(message.format(*(arg() if callable(arg) else arg for arg in args)))
+
+
 def legacy_output_format(outf):
     """Convert juparc format to format we used in MSR paper"""
     if outf.startswith("display_data/"):
@@ -24,8 +46,8 @@ def legacy_output_format(outf):
 
 
 def create_default(name=None):
-    """Create Notebook Dict Object"""
-    return {
+    """Create Notebook Record"""
+    return NotebookRecord({
         "name": name,
         "nbformat": 0,
         "kernel": "no-kernel",
@@ -61,12 +83,12 @@ def create_default(name=None):
         "execution_skips_middle_total": 0,
         "execution_skips_middle_size": 0,
 
-    }
+    })
 
 
 def create_cell(index=None):
-    """Create Cell Dict Object"""
-    return {
+    """Create Cell Record"""
+    return CellRecord({
         "index": index,
         "cell_type": "<unknown>",
         "execution_count": None,
@@ -78,7 +100,7 @@ def create_cell(index=None):
         "python": None,
         "status": [],
         "exception": None,
-    }
+    })
 
 
 def subfilter(filterlist, prefix):
@@ -98,6 +120,31 @@ def filterout(key, include, exclude):
     return False
 
 
+def remove_filtered(container, include, exclude):
+    """Remove keys that are filtered out. Returns container"""
+    if include or exclude:
+        for key in [key for key in container if filterout(key, include, exclude)]:
+            del container[key]
+    return container
+
+
+# Fields of failed results that are kept regardless of include/exclude
+ERROR_FIELDS = {"name", "status", "exception"}
+
+
+def error_result(nbrow, status, exception, include=None, exclude=None):
+    """Set status and exception of a notebook that could not be loaded
+
+    Returns nbrow with the fields kept by include/exclude and ERROR_FIELDS
+    """
+    nbrow["status"] = status
+    nbrow["exception"] = exception
+    if include or exclude:
+        for key in [key for key in nbrow if key not in ERROR_FIELDS and filterout(key, include, exclude)]:
+            del nbrow[key]
+    return nbrow
+
+
 def prepare_setvar(container, include, exclude):
     def setvar(key, value):
         if filterout(key, include, exclude):
@@ -107,6 +154,82 @@ def prepare_setvar(container, include, exclude):
     return setvar
 
 
+# Work that each notebook field depends on. The other fields (name, size,
+# and sha1_file) only need the file content
+METRICS_WORK = {"parse", "cells", "transform", "metrics"}
+FIELD_WORK = {
+    "nbformat": {"parse"},
+    "kernel": {"parse"},
+    "language": {"parse"},
+    "language_version": {"parse"},
+    "exception": {"parse"},
+    "max_execution_count": {"parse", "cells"},
+    "total_cells": {"parse", "cells"},
+    "code_cells": {"parse", "cells"},
+    "code_cells_with_output": {"parse", "cells", "output_formats"},
+    "markdown_cells": {"parse", "cells"},
+    "raw_cells": {"parse", "cells"},
+    "unknown_cell_formats": {"parse", "cells"},
+    "empty_cells": {"parse", "cells"},
+    "cells": {"parse", "cells", "cell_rows"},
+    "status": {"parse", "cells", "transform"},
+    "sha1_source": {"parse", "cells", "output_formats", "sha1_source"},
+    "word_counter": {"parse", "cells", "word_counter"},
+    "unambiguous": METRICS_WORK,
+    "actual_empty_cells": METRICS_WORK,
+    "non_executed_cells": METRICS_WORK,
+    "empty_cells_middle": METRICS_WORK,
+    "empty_cells_end": METRICS_WORK,
+    "numeric_counts_total": METRICS_WORK,
+    "numeric_set_total": METRICS_WORK,
+    "processing_cells": METRICS_WORK,
+    "unordered": METRICS_WORK,
+    "execution_skips_total": METRICS_WORK,
+    "execution_skips_size": METRICS_WORK,
+    "execution_skips_middle_total": METRICS_WORK,
+    "execution_skips_middle_size": METRICS_WORK,
+}
+
+# Work that each cell field depends on, in addition to the cell_rows work
+CELL_FIELD_WORK = {
+    "output_formats": {"output_formats"},
+    "legacy_output_formats": {"output_formats"},
+    "source": {"transform"},
+    "status": {"transform"},
+}
+
+
+class ExtractionPlan(object):
+    """Work that load must do to produce the fields kept by include/exclude
+
+    Work units: parse (read the notebook), cells (iterate over cells),
+    cell_rows (create cell records), transform (IPython transformation of
+    python code cells), output_formats, sha1_source, word_counter, and
+    metrics (execution order metrics). Work that no kept field depends on
+    is skipped
+    """
+
+    def __init__(self, include=None, exclude=None):
+        self.cell_include = subfilter(include, "cells")
+        self.cell_exclude = subfilter(exclude, "cells")
+        self.fields = [key for key in NOTEBOOK_FIELDS if not filterout(key, include, exclude)]
+        self.work = set()
+        for key in self.fields:
+            self.work |= FIELD_WORK.get(key, set())
+        if "cells" in self.fields:
+            for key in CELL_FIELDS:
+                if self.keeps_cell(key):
+                    self.work |= CELL_FIELD_WORK.get(key, set())
+
+    def needs(self, work):
+        """Check if some kept field depends on work"""
+        return work in self.work
+
+    def keeps_cell(self, key):
+        """Check if cell field is kept by the cell filters"""
+        return not filterout(key, self.cell_include, self.cell_exclude)
+
+
 def get_size(start_path = '.'):
     if os.path.isfile(start_path):
         return os.path.getsize(start_path)
@@ -120,10 +243,26 @@ def get_size(start_path = '.'):
     return total_size
 
 
+def read_bytes(path):
+    """Read the whole file (or archive member) content at once"""
+    if is_member(path):
+        return read_member(path)
+    with open(path, 'rb') as ofile:
+        return ofile.read()
+
+
+def sha1_bytes(data):
+    """Hash file content through a buffer view"""
+    with stage("sha1_hash"):
+        return hashlib.sha1(memoryview(data)).hexdigest()
+
+
 def sha1_hash(path):
+    if is_member(path):
+        return member_hash(path) or sha1_bytes(read_member(path))
     BUF_SIZE = 65536
     sha1 = hashlib.sha1()
-    with open(path, 'rb') as f:
+    with stage("sha1_hash"), open(path, 'rb') as f:
         while True:
             data = f.read(BUF_SIZE)
             if not data:
@@ -132,6 +271,13 @@ def sha1_hash(path):
     return sha1.hexdigest()
 
 
+def content_hash(path, data=None):
+    """Return sha1_file of path with content data. Git tree members use their blob id"""
+    if data is None:
+        return sha1_hash(path)
+    return (is_member(path) and member_hash(path)) or sha1_bytes(data)
+
+
 def set_kernel_language(metadata, setvar):
     """Extract kernel and language from notebook metadata"""
     setvar("kernel", metadata.get("kernelspec", {}).get("name", "no-kernel"))
@@ -165,97 +311,58 @@ def int_or_none(value):
         return None
 
 
-def count_middle_empty(arr):
-    while arr and arr[-1] == 'empty':
-        arr = arr[:-1]
-    return arr.count('empty')
+def is_empty_source(source):
+    """Check if source has only whitespaces"""
+    return re.sub(r'[\n\r]+', ' ', source).strip() == ''
 
 
-def select_numbers(arr):
-    for count in arr:
-        try:
-            yield int(count)
-        except (TypeError, ValueError):
-            pass
-
-
-@numba.jit("i8(i8[:])")
-def count_skips(arr):
-    last = 0
-    current = -10000
-    skips = 0
-    for element in arr:
-        current = element
-        if current - last > 1:
-            skips += 1
-        last = current
-    return skips
-
-
-@numba.jit("i8(i8[:])")
-def count_skips_sizes(arr):
-    last = 0
-    current = -10000
-    skips = 0
-    for element in arr:
-        current = element
-        if current != last:
-            skips += current - last - 1
-        last = current
-    return skips
-
-
-@numba.jit("i8(i8[:])")
-def count_skips_middle(arr):
-    last = -10000
-    current = -10000
-    skips = 0
-    for element in arr:
-        current = element
-        if last != -10000 and current - last > 1:
-            skips += 1
-        last = current
-    return skips
-
-
-@numba.jit("i8(i8[:])")
-def count_skips_sizes_middle(arr):
-    last = -10000
-    current = -10000
-    skips = 0
-    for element in arr:
-        current = element
-        if last != -10000 and current != last:
-            skips += current - last - 1
-        last = current
-    return skips
-
-
-def load_cells(lang_tuple, nbrow, cells, include=None, exclude=None, vprint=lambda x: None, count_words=None):
-    count_words = count_words or COUNT_WORDS
+def extracted_code_cells(notebook):
+    """Return (execution count, empty) of code cells from extracted notebook"""
+    result = []
+    for cell in notebook.get("cells") or []:
+        if cell.get("cell_type") == "code":
+            source = cell.get("source")
+            if source is None:
+                source = cell.get("raw_source") or ""
+            result.append((int_or_none(cell.get("execution_count")), is_empty_source(source)))
+    return result
+
+
+def load_cells(
+        lang_tuple, nbrow, cells, include=None, exclude=None, vprint=quiet,
+        count_words=None, plan=None
+):
+    """Extract cells and set the notebook fields that depend on them
+
+    Use plan (ExtractionPlan of the notebook filters) to skip work that
+    the kept fields do not need. Default: all the work
+    """
+    plan = plan or ExtractionPlan()
+    matcher = get_matcher(count_words or COUNT_WORDS) if plan.needs("word_counter") else None
     language, language_version = lang_tuple
     status = "ok"
-    shell = InteractiveShell.instance()
     is_python = language == "python"
     is_unknown_version = language_version == "unknown"
+    transform = is_python and plan.needs("transform")
     cells_info = []
     exec_count = -1
 
     concat_source = []
     word_counter = Counter()
 
-    unfiltered = []
-    execution_counts = []
+    code_cells = []
 
     for index, cell in enumerate(cells):
-        vprint("Loading cell {}".format(index))
+        vlog(vprint, "Loading cell {}", index)
 
         cell_exec_count = cell.get("execution_count")
         cell_exec_count_int = int_or_none(cell_exec_count)
         if cell_exec_count_int is not None:
             exec_count = max(exec_count, cell_exec_count_int)
 
-        output_formats = list(cell_output_formats(cell))
+        output_formats = []
+        if plan.needs("output_formats"):
+            output_formats = list(cell_output_formats(cell))
 
         cell_status = set()
         if is_unknown_version:
@@ -263,50 +370,47 @@ def load_cells(lang_tuple, nbrow, cells, include=None, exclude=None, vprint=lamb
 
         try:
             source = raw_source = cell["source"] = cell.get("source", "") or ""
-            concat_source.append(source)
-            lower = cell.source.lower()
-            for word in count_words:
-                if word in lower:
-                    word_counter[word] += 1
-            if is_python and cell.get("cell_type") == "code":
+            if matcher is not None:
+                word_counter.update(matcher.find(cell["source"].lower()))
+            if transform and cell.get("cell_type") == "code":
                 try:
-                    source = shell.input_transformer_manager.transform_cell(raw_source)
+                    with stage("transform_cell"):
+                        source = transform_cell(raw_source)
                 except (IndentationError, SyntaxError) as err:
-                    vprint("Error on cell transformation: {}".format(traceback.format_exc()))
+                    vlog(vprint, "Error on cell transformation: {}", traceback.format_exc)
                     source = ""
                     status = "load-syntax-error"
                     cell_status.add("syntax-error")
                 if "\0" in source:
-                    vprint("Found null byte in source. Replacing it by \\n")
+                    vlog(vprint, "Found null byte in source. Replacing it by \\n")
                     source = source.replace("\0", "\n")
 
-            cellrow = create_cell(index)
-            setcvar = prepare_setvar(cellrow, include, exclude)
-            setcvar("cell_type", cell.get("cell_type", "<unknown>"))
-            setcvar("execution_count", cell_exec_count)
-            setcvar("lines", cell["source"].count("\n") + 1)
-            setcvar("output_formats", output_formats)
-            cellrow["legacy_output_formats"] = ";".join(
-                set(map(legacy_output_format, cellrow["output_formats"]))
-            )
-            concat_source.append(cellrow["legacy_output_formats"])
-            setcvar("source", source)
-            setcvar("raw_source", raw_source)
-            setcvar("python", is_python)
-            setcvar("status", list(cell_status))
-            cells_info.append({
-                k: v for k, v in cellrow.items()
-                if not filterout(k, include, exclude)
-            })
+            # Legacy formats use the output formats of the cell record
+            legacy_output_formats = ";".join(set(map(
+                legacy_output_format,
+                output_formats if not filterout("output_formats", include, exclude) else []
+            )))
+            if plan.needs("sha1_source"):
+                concat_source.append(raw_source)
+                concat_source.append(legacy_output_formats)
+            if plan.needs("cell_rows"):
+                cellrow = create_cell(index)
+                setcvar = prepare_setvar(cellrow, include, exclude)
+                setcvar("cell_type", cell.get("cell_type", "<unknown>"))
+                setcvar("execution_count", cell_exec_count)
+                setcvar("lines", cell["source"].count("\n") + 1)
+                setcvar("output_formats", output_formats)
+                cellrow["legacy_output_formats"] = legacy_output_formats
+                setcvar("source", source)
+                setcvar("raw_source", raw_source)
+                setcvar("python", is_python)
+                setcvar("status", list(cell_status))
+                cells_info.append(remove_filtered(cellrow, include, exclude))
 
             nbrow["total_cells"] += 1
             if cell.get("cell_type") == "code":
-                if re.sub(r'[\n\r]+', ' ', source).strip() == '':
-                    execution_counts.append("empty")
-                else:
-                    execution_counts.append(cell_exec_count_int)
-                if cell_exec_count_int is not None:
-                    unfiltered.append(cell_exec_count_int)
+                if plan.needs("metrics"):
+                    code_cells.append((cell_exec_count_int, is_empty_source(source)))
                 nbrow["code_cells"] += 1
                 if output_formats:
                     nbrow["code_cells_with_output"] += 1
@@ -319,16 +423,16 @@ def load_cells(lang_tuple, nbrow, cells, include=None, exclude=None, vprint=lamb
             if not cell["source"].strip():
                 nbrow["empty_cells"] += 1
         except KeyError as err:
-            vprint("Error on cell extraction: {}".format(traceback.format_exc()))
+            vlog(vprint, "Error on cell extraction: {}", traceback.format_exc)
             status = "load-format-error"
 
-    lower = nbrow["name"].lower()
-    for word in count_words:
-        if word in lower:
+    if matcher is not None:
+        for word in matcher.find(nbrow["name"].lower()):
             word_counter[word] = -word_counter[word] - 1
 
-    concat_str = "<#<cell>#>\n".join(concat_source)
-    nbrow["sha1_source"] = hashlib.sha1(concat_str.encode('utf-8')).hexdigest()
+    if plan.needs("sha1_source"):
+        concat_str = "<#<cell>#>\n".join(concat_source)
+        nbrow["sha1_source"] = hashlib.sha1(concat_str.encode('utf-8')).hexdigest()
     nbrow["word_counter"] = word_counter
 
     if nbrow["total_cells"] == 0:
@@ -337,60 +441,117 @@ def load_cells(lang_tuple, nbrow, cells, include=None, exclude=None, vprint=lamb
     nbrow["max_execution_count"] = exec_count
     nbrow["status"] = status
 
-
-    numbers = set(unfiltered)
-    nbrow["unambiguous"] = unfiltered and len(numbers) == len(unfiltered)
-
-    numeric_counts = list(select_numbers(execution_counts))
-    numeric_sorted = sorted(numeric_counts)
-    numpy_sorted = numpy.array(numeric_sorted, dtype=int)
-
-    nbrow["actual_empty_cells"] = execution_counts.count('empty')
-    nbrow["non_executed_cells"] = execution_counts.count(None)
-    nbrow["empty_cells_middle"] = count_middle_empty(execution_counts)
-    nbrow["empty_cells_end"] = nbrow["actual_empty_cells"] - nbrow["empty_cells_middle"]
-    nbrow["numeric_counts_total"] = len(numeric_counts)
-    nbrow["numeric_set_total"] = len(set(numeric_counts))
-    nbrow["processing_cells"] = execution_counts.count('*')
-    nbrow["unordered"] = numeric_counts != numeric_sorted
-    nbrow["execution_skips_total"] = count_skips(numpy_sorted)
-    nbrow["execution_skips_size"] = count_skips_sizes(numpy_sorted)
-    nbrow["execution_skips_middle_total"] = count_skips_middle(numpy_sorted)
-    nbrow["execution_skips_middle_size"] = count_skips_sizes_middle(numpy_sorted)
+    if plan.needs("metrics"):
+        from .metrics import notebook_metrics  # imports numpy and numba
+        with stage("metrics"):
+            nbrow.update(notebook_metrics(code_cells))
 
     return cells_info
 
 
-def load(name, basepath="", nbrow=None, include=None, exclude=None, vprint=lambda x: None):
-    """Extract notebook information and cells from notebook"""
+def rename_word_counter(word_counter, old_name, new_name, count_words=None):
+    """Move the name encoding of word_counter from old_name to new_name"""
+    matcher = get_matcher(count_words or COUNT_WORDS)
+    word_counter = Counter(word_counter)
+    for word in matcher.find(old_name.lower()):
+        word_counter[word] = -word_counter[word] - 1
+        if not word_counter[word]:
+            del word_counter[word]
+    for word in matcher.find(new_name.lower()):
+        word_counter[word] = -word_counter[word] - 1
+    return word_counter
+
+
+def load_cached(
+        name, cache, sha1_file, include=None, exclude=None, count_words=None, reader="nbformat"
+):
+    """Get cached load result of a notebook with the same file hash"""
+    cached = cache.get(sha1_file, include, exclude, count_words, reader)
+    if cached is None:
+        return None
+    if "word_counter" in cached:
+        cached["word_counter"] = rename_word_counter(
+            cached["word_counter"], cached["name"], name, count_words
+        )
+    cached["name"] = name
+    return cached
+
+
+def load(
+        name, basepath="", nbrow=None, include=None, exclude=None,
+        vprint=quiet, cache=None, reader="nbformat", count_words=None,
+        data=None, file_hash=None
+):
+    """Extract notebook information and cells from notebook
+
+    The file is read only once: its size, hash, and notebook come from
+    the same buffer. If cache is an ExtractionCache, notebooks with the
+    same file hash are served from the cache and new results are stored
+    in it. The reader is either nbformat, fast, or stream (see juparc.reader).
+    The stream reader does not load the file at once. count_words is the
+    vocabulary of word_counter (default: COUNT_WORDS). Only the work that
+    the fields kept by include/exclude depend on is done (see ExtractionPlan),
+    e.g., notebooks are not parsed if only name, size, and sha1_file are
+    kept. Names may refer to archive members (ARCHIVE!/MEMBER, see
+    juparc.archive). The sha1_file of git tree members is their blob id.
+    Use data to pass the file content, if it was already read, and
+    file_hash to pass its sha1_file, if known
+    """
     nbrow = nbrow or create_default(name)
     setvar = prepare_setvar(nbrow, include, exclude)
+    plan = ExtractionPlan(include, exclude)
+    sha1_file = None
     try:
         npath = os.path.join(basepath, name)
-        with open(npath) as ofile:
-            notebook = nbf.read(ofile, nbf.NO_CONVERT)
-        setvar("size", lambda: get_size(npath))
-        setvar("sha1_file", lambda: sha1_hash(npath))
-        setvar("nbformat", "{0[nbformat]}".format(notebook))
-        if "nbformat_minor" in notebook:
-            setvar("nbformat", nbrow["nbformat"] + ".{0[nbformat_minor]}".format(notebook))
-        notebook = nbf.convert(notebook, 4)
-        metadata = notebook["metadata"]
+        if is_archive(npath):
+            check_archive(npath)
+        parse = plan.needs("parse")
+        if data is None and (reader != "stream" or is_member(npath) or not parse):
+            with stage("read"):
+                data = read_bytes(npath)
+        if cache is not None:
+            sha1_file = file_hash or content_hash(npath, data)
+            with stage("cache"):
+                cached = load_cached(name, cache, sha1_file, include, exclude, count_words, reader)
+            if cached is not None:
+                return cached
+        if not parse:
+            notebook = None
+            size, digest = len(data), file_hash or (lambda: content_hash(npath, data))
+        elif data is None:
+            with stage("parse"):
+                notebook, version, size, digest = read_stream(npath)
+        else:
+            with stage("parse"):
+                notebook, version = read_notebook(data, reader)
+            size, digest = len(data), file_hash or (lambda: content_hash(npath, data))
+        setvar("size", size)
+        setvar("sha1_file", sha1_file or digest)
+        if parse:
+            setvar("nbformat", version)
+            with stage("convert"):
+                notebook = convert_notebook(notebook)
+            metadata = notebook["metadata"]
     except OSError:
-        vprint("Failed to open notebook {}".format(nbrow["exception"]))
-        setvar("status", "load-error")
-        setvar("exception", traceback.format_exc())
-        return nbrow
+        vlog(vprint, "Failed to open notebook {}", nbrow["exception"])
+        return error_result(nbrow, "load-error", traceback.format_exc(), include, exclude)
     except Exception:  # pylint: disable=broad-except
-        vprint("Failed to load notebook {}".format(nbrow["exception"]))
-        setvar("status", "load-format-error")
-        setvar("exception", traceback.format_exc())
+        vlog(vprint, "Failed to load notebook {}", nbrow["exception"])
+        nbrow = error_result(nbrow, "load-format-error", traceback.format_exc(), include, exclude)
+        if sha1_file is not None:
+            cache.put(sha1_file, nbrow, include, exclude, count_words, reader)
         return nbrow
 
-    lang_tuple = set_kernel_language(metadata, setvar)
-    setvar("cells", load_cells(
-        lang_tuple, nbrow, notebook["cells"],
-        include=subfilter(include, "cells"), exclude=subfilter(exclude, "cells"),
-        vprint=vprint
-    ))
-    return {k: v for k, v in nbrow.items() if not filterout(k, include, exclude)}
+    if parse:
+        lang_tuple = set_kernel_language(metadata, setvar)
+        if plan.needs("cells"):
+            with stage("load_cells"):
+                setvar("cells", load_cells(
+                    lang_tuple, nbrow, notebook["cells"],
+                    include=subfilter(include, "cells"), exclude=subfilter(exclude, "cells"),
+                    vprint=vprint, count_words=count_words, plan=plan
+                ))
+    result = remove_filtered(nbrow, include, exclude)
+    if sha1_file is not None:
+        cache.put(sha1_file, result, include, exclude, count_words, reader)
+    return result
@@ -0,0 +1,135 @@
+"""Git trees: read repository files from the local git object database
+
+A tree is named REPO@REF (e.g., mirrors/project.git@main) and its files
+are archive members (REPO@REF!/PATH, see juparc.archive), so bare clones
+do not need a working tree. The tree is listed once with git ls-tree and
+blobs are read through a single git cat-file --batch process. The blob id
+of a file is its content hash
+"""
+import os
+import subprocess
+import threading
+
+# Modes of regular files in git trees
+FILE_MODES = {"100644", "100755"}
+
+
+def is_git_dir(path):
+    """Check if path is a git repository (bare or with a working tree)"""
+    if os.path.exists(os.path.join(path, ".git")):
+        return True
+    return (
+        os.path.isfile(os.path.join(path, "HEAD"))
+        and os.path.isdir(os.path.join(path, "objects"))
+    )
+
+
+def split_tree(spec):
+    """Split REPO@REF into (repo, ref)"""
+    repo, ref = spec.rsplit("@", 1)
+    return repo, ref
+
+
+def is_git_tree(spec):
+    """Check if spec is REPO@REF of a local git repository"""
+    if "@" not in spec:
+        return False
+    repo, ref = split_tree(spec)
+    return bool(ref) and is_git_dir(repo)
+
+
+def git(repo, *args):
+    """Run git command in repo. Returns stdout bytes. Raises OSError on errors"""
+    try:
+        return subprocess.run(
+            ["git", "-C", repo] + list(args),
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            check=True
+        ).stdout
+    except subprocess.CalledProcessError as err:
+        raise OSError("git {} failed in {}: {}".format(
+            args[0], repo, err.stderr.decode("utf-8", "replace").strip()
+        ))
+
+
+def parse_ls_tree(output):
+    """Parse git ls-tree -r -l -z output. Yields (path, blob id, size) of files
+
+    The size is None if the blob is missing from the repository
+    """
+    for line in output.split(b"\0"):
+        if not line:
+            continue
+        info, path = line.split(b"\t", 1)
+        mode, kind, blob, size = info.split()
+        if kind == b"blob" and mode.decode() in FILE_MODES:
+            yield path.decode("utf-8", "surrogateescape"), blob.decode(), int(size) if size.isdigit() else None
+
+
+class BlobReader(object):
+    """Read blobs of a repository with a git cat-file --batch process"""
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.process = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Start cat-file process"""
+        self.process = subprocess.Popen(
+            ["git", "-C", self.repo, "cat-file", "--batch"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+
+    def read(self, blob):
+        """Read blob content"""
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self.start()
+            self.process.stdin.write(blob.encode() + b"\n")
+            self.process.stdin.flush()
+            header = self.process.stdout.readline().split()
+            if len(header) != 3:
+                raise FileNotFoundError("Blob {} is not in {}".format(blob, self.repo))
+            data = self.process.stdout.read(int(header[2]))
+            self.process.stdout.read(1)
+            return data
+
+    def close(self):
+        """Stop cat-file process"""
+        if self.process is not None and self.process.poll() is None:
+            self.process.stdin.close()
+            self.process.wait()
+        self.process = None
+
+
+class GitTree(object):
+    """Files of a git tree with the Archive interface (see juparc.archive)"""
+
+    def __init__(self, spec):
+        self.path = spec
+        self.repo, self.ref = split_tree(spec)
+        self.commit = git(self.repo, "rev-parse", "--verify", self.ref + "^{commit}").decode().strip()
+        self.mtime = int(git(self.repo, "show", "-s", "--format=%ct", self.commit)) * 10 ** 9
+        self.members = {
+            path: (blob, size)
+            for path, blob, size in parse_ls_tree(git(self.repo, "ls-tree", "-r", "-l", "-z", self.commit))
+        }
+        self.path_set = None
+        self.reader = BlobReader(self.repo)
+
+    def names(self):
+        """Return file paths in the tree order"""
+        return list(self.members)
+
+    def read(self, member):
+        """Read file content"""
+        return self.reader.read(self.members[member][0])
+
+    def stat(self, member):
+        """Return (size, commit time in ns) of file"""
+        return self.members[member][1], self.mtime
+
+    def hash(self, member):
+        """Return blob id of file"""
+        return self.members[member][0]
@@ -0,0 +1,104 @@
+"""History: extract every notebook revision of a git repository once
+
+The commits of a local repository are walked with a single git log in
+topological order (parents first). Each commit is compared to its first
+parent, so a revision lists only the notebooks that the commit added,
+changed (path: blob id), or deleted (path: None). The notebooks of a
+commit are the notebooks of its first parent updated by its revision.
+Each distinct blob is extracted once, as REPO@COMMIT!/PATH of the first
+commit that has it, and its sha1_file is the blob id
+"""
+from .archive import glob_regex, member_name
+from .gitrepo import FILE_MODES, git, BlobReader
+
+
+def parse_log(output):
+    """Parse git log --raw -z output with the %x01%H %P%x00%ct format
+
+    Yields (commit, parents, time, [(path, blob id or None)])
+    """
+    tokens = iter(output.decode("utf-8", "surrogateescape").split("\0"))
+    current = None
+    for token in tokens:
+        token = token.strip("\n")
+        if token.startswith("\x01"):
+            if current is not None:
+                yield current
+            commit, *parents = token[1:].split()
+            current = (commit, parents, int(next(tokens).strip()), [])
+        elif token.startswith(":"):
+            _, mode, _, blob, _ = token[1:].split()
+            path = next(tokens)
+            current[3].append((path, blob if mode in FILE_MODES else None))
+    if current is not None:
+        yield current
+
+
+def walk_history(repo, refs=("HEAD",), pattern="**/*.ipynb"):
+    """Yield revisions of the notebooks that match the glob pattern
+
+    A revision is a dict with the commit, its parents, its commit time, and
+    the notebooks that changed since its first parent (path: blob or None)
+    """
+    regex = glob_regex(pattern)
+    output = git(
+        repo, "log", "--reverse", "--topo-order", "--diff-merges=first-parent",
+        "--raw", "-z", "--no-renames", "--no-abbrev",
+        "--format=%x01%H %P%x00%ct", *refs, "--"
+    )
+    for commit, parents, time, changes in parse_log(output):
+        yield {
+            "commit": commit,
+            "parents": parents,
+            "time": time,
+            "notebooks": {path: blob for path, blob in changes if regex.match(path)},
+        }
+
+
+def notebook_states(revisions):
+    """Yield (revision, notebooks) with all notebooks (path: blob) of each commit"""
+    states = {}
+    for revision in revisions:
+        parents = revision["parents"]
+        state = dict(states.get(parents[0], {})) if parents else {}
+        for path, blob in revision["notebooks"].items():
+            if blob is None:
+                state.pop(path, None)
+            else:
+                state[path] = blob
+        states[revision["commit"]] = state
+        yield revision, state
+
+
+def new_blobs(repo, revisions, known=()):
+    """Yield (REPO@COMMIT!/PATH, blob id) of the first commit of each blob
+
+    Blobs in known are skipped
+    """
+    seen = set(known)
+    for revision in revisions:
+        for path, blob in revision["notebooks"].items():
+            if blob is not None and blob not in seen:
+                seen.add(blob)
+                yield member_name("{}@{}".format(repo, revision["commit"]), path), blob
+
+
+def blob_tasks(repo, blobs):
+    """Read blobs in the current process. Yields (name, data, blob id) tasks
+
+    Blobs that cannot be read are yielded as names, so the worker reads them
+    again and reports the error as load-error. See juparc.parallel.load_task
+    """
+    reader = BlobReader(repo)
+    try:
+        for name, blob in blobs:
+            try:
+                data = reader.read(blob)
+            except OSError:
+                # The cat-file process restarts on the next read
+                reader.close()
+                yield name
+                continue
+            yield name, data, blob
+    finally:
+        reader.close()
@@ -0,0 +1,105 @@
+"""Run journal: checkpoint the items written to an output file"""
+import json
+import os
+import time
+
+from collections import Counter
+
+
+class RunJournal(object):
+    """Journal of the items written to an output file
+
+    The first line has the output format. Each following line has the
+    name of a written item and the output offset after it. Lines are kept
+    in memory until a checkpoint, every `every` items or `seconds` seconds,
+    and when the journal is closed. A checkpoint syncs the output to disk
+    and only then writes and syncs the lines, so the journal never refers
+    to data that is not in the output, even after a power loss. Items after
+    the last checkpoint are written again by a resumed run. An incomplete
+    last line (e.g., from a killed process) is ignored
+    """
+
+    def __init__(self, path, output_format, every=1000, seconds=10.0):
+        self.path = path
+        self.output_format = output_format
+        self.every = every
+        self.seconds = seconds
+        self.done = Counter()
+        self.offset = 0
+        self.size = 0
+        self.file = None
+        self.output = None
+        self.pending = []
+        self.last_checkpoint = time.monotonic()
+
+    def load(self):
+        """Load completed items and the last offset from the journal file"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as journal:
+            data = journal.read()
+        self.size = data.rfind(b"\n") + 1
+        lines = data[:self.size].decode("utf-8").splitlines()
+        if not lines:
+            return
+        header = json.loads(lines[0])
+        if header.get("format") != self.output_format:
+            raise ValueError("Journal {} was created for {} output, not {}".format(
+                self.path, header.get("format"), self.output_format
+            ))
+        for line in lines[1:]:
+            entry = json.loads(line)
+            self.done[entry["name"]] += 1
+            self.offset = entry["offset"]
+
+    def open(self):
+        """Open journal for writing after the loaded entries"""
+        if self.size:
+            os.truncate(self.path, self.size)
+            self.file = open(self.path, "a", encoding="utf-8")
+            return
+        self.file = open(self.path, "w", encoding="utf-8")
+        self.file.write(json.dumps({"format": self.output_format}) + "\n")
+        self.sync()
+
+    def sync(self):
+        """Flush journal file to disk"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def record(self, name, offset, output):
+        """Record item written to output. Checkpoints if it is due"""
+        self.output = output
+        self.pending.append(json.dumps({"name": name, "offset": offset}) + "\n")
+        self.done[name] += 1
+        self.offset = offset
+        if (len(self.pending) >= self.every
+                or time.monotonic() - self.last_checkpoint >= self.seconds):
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Sync the output and then write and sync the pending lines"""
+        self.last_checkpoint = time.monotonic()
+        if not self.pending:
+            return
+        self.output.flush()
+        os.fsync(self.output.fileno())
+        self.file.write("".join(self.pending))
+        self.pending = []
+        self.sync()
+
+    def skip_done(self, names):
+        """Skip names that were completed. Repeated names are skipped once per entry"""
+        remaining = Counter(self.done)
+        for name in names:
+            if remaining[name] > 0:
+                remaining[name] -= 1
+            else:
+                yield name
+
+    def close(self):
+        """Checkpoint pending items and close journal file"""
+        if self.file is not None:
+            self.checkpoint()
+            self.file.close()
+            self.file = None
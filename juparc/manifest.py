@@ -0,0 +1,163 @@
+"""Extraction manifest: skip notebooks that did not change since the last run"""
+import hashlib
+import json
+import os
+
+from .archive import is_member, stat_member
+from .cache import CACHE_SCHEMA
+from .extract import sha1_hash
+
+# Results that are reused when their notebook does not change. Duplicates
+# (see juparc.dedup) are reused only with their canonical notebook
+REUSED_STATUSES = ("ok", "duplicate")
+
+
+def manifest_options(count_words=None, include=None, exclude=None, reader="nbformat"):
+    """Options that change the extraction results"""
+    options = {"schema": CACHE_SCHEMA, "count_words": None}
+    if reader != "nbformat":
+        options["reader"] = reader
+    if include or exclude:
+        options["include"], options["exclude"] = include, exclude
+    if count_words is not None:
+        options["count_words"] = hashlib.sha1(
+            json.dumps(count_words).encode("utf-8")
+        ).hexdigest()
+    return options
+
+
+def file_entry(name):
+    """Return manifest entry with the size and mtime of a file
+
+    Size and mtime are None if the file cannot be accessed.
+    Archive members get the size and mtime recorded in the archive
+    """
+    entry = {"name": name, "size": None, "mtime": None, "sha1_file": None}
+    try:
+        if is_member(name):
+            entry["size"], entry["mtime"] = stat_member(name)
+            return entry
+        stat = os.stat(name)
+    except OSError:
+        return entry
+    entry["size"], entry["mtime"] = stat.st_size, stat.st_mtime_ns
+    return entry
+
+
+class Manifest(object):
+    """Manifest of the notebook files of an extraction
+
+    The first line has the extraction options. Each following line has the
+    name, size, mtime, and sha1_file of a notebook. A notebook is unchanged
+    if it has the same size and mtime as in the manifest, or the same
+    sha1_file if only the mtime changed. Entries of a manifest created with
+    other options are ignored
+    """
+
+    def __init__(self, path, options):
+        self.path = path
+        self.options = options
+        self.entries = {}
+        self.current = {}
+
+    def load(self):
+        """Load entries from the manifest file. Returns False if it cannot be used"""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "r", encoding="utf-8") as manifest:
+            lines = iter(manifest)
+            header = json.loads(next(lines, "{}"))
+            if header.get("options") != self.options:
+                return False
+            for line in lines:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries[entry["name"]] = entry
+        return True
+
+    def unchanged(self, entry):
+        """Check if file entry matches the manifest. Updates its sha1_file"""
+        previous = self.entries.get(entry["name"])
+        if previous is None or previous["size"] != entry["size"]:
+            return False
+        if previous["mtime"] != entry["mtime"]:
+            if previous["sha1_file"] is None:
+                return False
+            try:
+                if sha1_hash(entry["name"]) != previous["sha1_file"]:
+                    return False
+            except OSError:
+                return False
+        entry["sha1_file"] = previous["sha1_file"]
+        return True
+
+    def save(self):
+        """Write current entries. The file is replaced atomically"""
+        temp = self.path + ".tmp"
+        with open(temp, "w", encoding="utf-8") as manifest:
+            manifest.write(json.dumps({"options": self.options}) + "\n")
+            for entry in self.current.values():
+                manifest.write(json.dumps(entry) + "\n")
+        os.replace(temp, self.path)
+
+
+def incremental_load(names, manifest, read_previous, load_names, ordered=True):
+    """Load changed notebooks and reuse previous results of unchanged ones
+
+    read_previous is a function that receives a set of names and returns
+    {name: result} of the last run for these names. It is called before
+    this function returns, so the previous output can be the file that
+    receives the new results. load_names is a function that receives a list
+    of names and yields their results (in the same order, if ordered).
+    Returns an iterator over the results of all names, so previous results
+    of notebooks that are not in names (e.g., deleted ones) are dropped.
+    The current entries of the manifest are updated with the ok and
+    duplicate results; failed ones (e.g., load-timeout) are loaded again
+    in the next run.
+    Duplicate results (see juparc.dedup) are reused only if their
+    canonical notebook is reused
+    """
+    entries = [file_entry(name) for name in names]
+    unchanged = {
+        entry["name"] for entry in entries
+        if entry["size"] is not None and manifest.unchanged(entry)
+    }
+    previous = read_previous(unchanged) if unchanged else {}
+    plan = []
+    changed = []
+    reused = set()
+    for entry in entries:
+        name = entry["name"]
+        canonical = name in previous and previous[name].get("duplicate_of")
+        reuse = name in previous and (not canonical or canonical in reused)
+        plan.append((entry, reuse))
+        if reuse:
+            reused.add(name)
+        else:
+            changed.append(name)
+    return iter_incremental(plan, changed, manifest, previous, load_names, ordered)
+
+
+def iter_incremental(plan, changed, manifest, previous, load_names, ordered):
+    """Yield results of the (entry, reuse) plan of incremental_load"""
+
+    def record(entry, result):
+        """Store manifest entry of ok or duplicate result"""
+        if entry["size"] is not None and result.get("status") in REUSED_STATUSES:
+            entry["sha1_file"] = result.get("sha1_file") or entry["sha1_file"]
+            manifest.current[entry["name"]] = entry
+        return result
+
+    loaded = load_names(changed)
+    if ordered:
+        for entry, reuse in plan:
+            yield record(entry, previous.pop(entry["name"]) if reuse else next(loaded))
+        return
+    pending = {}
+    for entry, reuse in plan:
+        if reuse:
+            yield record(entry, previous.pop(entry["name"]))
+        else:
+            pending.setdefault(entry["name"], []).append(entry)
+    for result in loaded:
+        yield record(pending[result["name"]].pop(), result)
@@ -395,30 +395,54 @@ def generate_markdown_cells(notebook, identifier):
             )
 
 
+def iter_split_markdown(chunks, pattern):
+    """Split concatenated markdown chunks into blocks
+
+    Yields each block as soon as the header of the next one is read.
+    Text before the first header is discarded. If there is no header,
+    the whole text is a single block identified as Markdown. A header
+    has at most the line breaks of the pattern, so only the last lines of
+    the text that was already searched are searched again with each chunk
+    """
+    pattern = re.compile(pattern.format("(.*)"))
+    breaks = pattern.pattern.count("\n") + pattern.pattern.count("\\n")
+    buffer = ""
+    scan = 0
+    name = None
+    for chunk in chunks:
+        end = len(buffer)
+        buffer += chunk
+        # Headers that start before the last breaks + 1 line breaks of the
+        # searched text would have been found in it
+        start = end
+        for _ in range(breaks + 1):
+            start = buffer.rfind("\n", scan, start)
+            if start == -1:
+                start = scan
+                break
+        else:
+            start += 1
+        pos = 0
+        for match in pattern.finditer(buffer, start):
+            if name is not None:
+                yield {
+                    'identifier': name,
+                    'code': buffer[pos:match.start()]
+                }
+            name = match.group(1)
+            pos = match.end()
+        buffer = buffer[pos:]
+        scan = 0 if pos else start
+
+    yield {
+        'identifier': "Markdown" if name is None else name,
+        'code': buffer
+    }
+
+
 def split_markdown(markdown, pattern):
     """Split concatenated markdown text into blocks"""
-    blocks = []
-    pattern = re.compile(pattern.format("(.*)"))
-    for match in pattern.finditer(markdown):
-        blocks.append((match.start(), match.group(), match.group(1)))
-
-    if not blocks:
-        blocks.append((0, "", "Markdown"))
-    blocks.append((len(markdown), "", '#End'))
-
-    it_blocks = iter(blocks)
-    last_pos, last_group, last_name = next(it_blocks)
-
-    split_blocks = []
-    for pos, group, name in it_blocks:
-        code = markdown[last_pos + len(last_group):pos]
-        split_blocks.append({
-            'identifier': last_name,
-            'code': code
-        })
-        last_pos, last_group, last_name = pos, group, name
-
-    return split_blocks
+    return list(iter_split_markdown([markdown], pattern))
 
 
 def aggregate_markdown(markdown_cells):
@@ -0,0 +1,262 @@
+"""Execution order metrics: vectorized over the code cells of many notebooks
+
+The code cells of a corpus are stored as a ragged array: values has the
+execution count of each cell, flags has HAS_COUNT if the count is a number
+and EMPTY if the cell source is empty, and the cells of notebook i are in
+values[offsets[i]:offsets[i + 1]]. All metrics are computed in a single
+pass with NumPy. If numba is installed, a compiled kernel is used instead.
+It is compiled on the first use and cached on disk
+"""
+import numpy
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+HAS_COUNT = 1
+EMPTY = 2
+
+# Initial value of the previous count in the *_middle skips
+SENTINEL = -10000
+
+METRICS = [
+    "unambiguous",
+    "actual_empty_cells",
+    "non_executed_cells",
+    "empty_cells_middle",
+    "empty_cells_end",
+    "numeric_counts_total",
+    "numeric_set_total",
+    "processing_cells",
+    "unordered",
+    "execution_skips_total",
+    "execution_skips_size",
+    "execution_skips_middle_total",
+    "execution_skips_middle_size",
+]
+
+NUMBA_KERNEL = None
+
+
+def cell_flags(count, empty):
+    """Return flags of a code cell. count is an int or None"""
+    return (HAS_COUNT if count is not None else 0) | (EMPTY if empty else 0)
+
+
+def encode(notebooks):
+    """Create ragged array from lists of (count, empty) code cells
+
+    Returns values, flags, and offsets
+    """
+    values = []
+    flags = []
+    offsets = [0]
+    for cells in notebooks:
+        for count, empty in cells:
+            values.append(count if count is not None else 0)
+            flags.append(cell_flags(count, empty))
+        offsets.append(len(values))
+    return (
+        numpy.array(values, dtype=numpy.int64),
+        numpy.array(flags, dtype=numpy.int8),
+        numpy.array(offsets, dtype=numpy.int64),
+    )
+
+
+def segment_sum(array, offsets):
+    """Sum array elements of each segment"""
+    cumsum = numpy.zeros(len(array) + 1, dtype=numpy.int64)
+    numpy.cumsum(array, out=cumsum[1:])
+    return cumsum[offsets[1:]] - cumsum[offsets[:-1]]
+
+
+def select_offsets(mask, offsets):
+    """Offsets of the ragged array obtained by selecting mask"""
+    result = numpy.zeros(len(offsets), dtype=numpy.int64)
+    numpy.cumsum(segment_sum(mask, offsets), out=result[1:])
+    return result
+
+
+def sort_segments(values, offsets):
+    """Sort values inside each segment"""
+    segments = numpy.repeat(numpy.arange(len(offsets) - 1), numpy.diff(offsets))
+    return values[numpy.lexsort((values, segments))]
+
+
+def segment_starts(size, offsets):
+    """Boolean array that marks the first element of each segment"""
+    starts = numpy.zeros(size + 1, dtype=bool)
+    starts[offsets[:-1]] = True
+    return starts[:size]
+
+
+def previous_values(values, starts, initial):
+    """Previous value in the segment. Segments start with initial"""
+    previous = numpy.empty_like(values)
+    previous[1:] = values[:-1]
+    previous[starts] = initial
+    return previous
+
+
+def numpy_kernel(values, flags, offsets):
+    """Compute metrics with NumPy. Returns int64 matrix (notebooks x METRICS)"""
+    result = numpy.zeros((len(offsets) - 1, len(METRICS)), dtype=numpy.int64)
+    column = {name: index for index, name in enumerate(METRICS)}
+    has_count = (flags & HAS_COUNT) != 0
+    empty = (flags & EMPTY) != 0
+    numeric = has_count & ~empty
+
+    # Empty cells followed by a non-empty cell in the same notebook
+    nonempty = numpy.zeros(len(flags) + 1, dtype=numpy.int64)
+    numpy.cumsum(~empty, out=nonempty[1:])
+    segments = numpy.repeat(numpy.arange(len(offsets) - 1), numpy.diff(offsets))
+    middle = empty & (nonempty[offsets[1:]][segments] > nonempty[1:])
+
+    actual_empty = segment_sum(empty, offsets)
+    empty_middle = segment_sum(middle, offsets)
+    result[:, column["actual_empty_cells"]] = actual_empty
+    result[:, column["non_executed_cells"]] = segment_sum(~has_count & ~empty, offsets)
+    result[:, column["empty_cells_middle"]] = empty_middle
+    result[:, column["empty_cells_end"]] = actual_empty - empty_middle
+
+    # Unambiguous: counts (including empty cells) without repetition
+    count_offsets = select_offsets(has_count, offsets)
+    counts = sort_segments(values[has_count], count_offsets)
+    starts = segment_starts(len(counts), count_offsets)
+    repeated = ~starts & (counts == previous_values(counts, starts, 0))
+    unambiguous = (segment_sum(repeated, count_offsets) == 0).astype(numpy.int64)
+    unambiguous[count_offsets[1:] == count_offsets[:-1]] = -1
+    result[:, column["unambiguous"]] = unambiguous
+
+    # Numeric counts of non-empty cells in cell order
+    numeric_offsets = select_offsets(numeric, offsets)
+    numbers = values[numeric]
+    starts = segment_starts(len(numbers), numeric_offsets)
+    decrease = ~starts & (numbers < previous_values(numbers, starts, 0))
+    result[:, column["numeric_counts_total"]] = numpy.diff(numeric_offsets)
+    result[:, column["unordered"]] = segment_sum(decrease, numeric_offsets) > 0
+
+    # Skips over sorted numeric counts
+    numbers = sort_segments(numbers, numeric_offsets)
+    previous = previous_values(numbers, starts, 0)
+    unique = starts | (numbers != previous)
+    result[:, column["numeric_set_total"]] = segment_sum(unique, numeric_offsets)
+    diff = numbers - previous
+    result[:, column["execution_skips_total"]] = segment_sum(diff > 1, numeric_offsets)
+    result[:, column["execution_skips_size"]] = segment_sum(
+        numpy.where(diff != 0, diff - 1, 0), numeric_offsets
+    )
+    previous = previous_values(numbers, starts, SENTINEL)
+    valid = previous != SENTINEL
+    diff = numbers - previous
+    result[:, column["execution_skips_middle_total"]] = segment_sum(
+        valid & (diff > 1), numeric_offsets
+    )
+    result[:, column["execution_skips_middle_size"]] = segment_sum(
+        numpy.where(valid & (diff != 0), diff - 1, 0), numeric_offsets
+    )
+    return result
+
+
+def loop_kernel(values, flags, offsets, result):
+    """Compute metrics notebook by notebook. Compiled by numba_kernel"""
+    for notebook in range(len(offsets) - 1):
+        start, end = offsets[notebook], offsets[notebook + 1]
+        counts = numpy.empty(end - start, dtype=numpy.int64)
+        numbers = numpy.empty(end - start, dtype=numpy.int64)
+        total_counts = total_numbers = 0
+        empty = not_executed = middle = trailing = unordered = 0
+        for index in range(start, end):
+            if flags[index] & EMPTY:
+                empty += 1
+                trailing += 1
+            else:
+                middle += trailing
+                trailing = 0
+                if not flags[index] & HAS_COUNT:
+                    not_executed += 1
+            if flags[index] & HAS_COUNT:
+                counts[total_counts] = values[index]
+                total_counts += 1
+                if not flags[index] & EMPTY:
+                    if total_numbers and values[index] < numbers[total_numbers - 1]:
+                        unordered = 1
+                    numbers[total_numbers] = values[index]
+                    total_numbers += 1
+        counts = numpy.sort(counts[:total_counts])
+        numbers = numpy.sort(numbers[:total_numbers])
+
+        unambiguous = -1
+        if total_counts:
+            unambiguous = 1
+            for index in range(1, total_counts):
+                if counts[index] == counts[index - 1]:
+                    unambiguous = 0
+
+        unique = skips = skips_size = middle_skips = middle_size = 0
+        last = 0
+        last_middle = SENTINEL
+        for index in range(total_numbers):
+            current = numbers[index]
+            if index == 0 or current != numbers[index - 1]:
+                unique += 1
+            if current - last > 1:
+                skips += 1
+            if current != last:
+                skips_size += current - last - 1
+            if last_middle != SENTINEL and current - last_middle > 1:
+                middle_skips += 1
+            if last_middle != SENTINEL and current != last_middle:
+                middle_size += current - last_middle - 1
+            last = last_middle = current
+
+        row = result[notebook]
+        row[0] = unambiguous
+        row[1] = empty
+        row[2] = not_executed
+        row[3] = middle
+        row[4] = empty - middle
+        row[5] = total_numbers
+        row[6] = unique
+        row[7] = 0
+        row[8] = unordered
+        row[9] = skips
+        row[10] = skips_size
+        row[11] = middle_skips
+        row[12] = middle_size
+
+
+def numba_kernel(values, flags, offsets):
+    """Compute metrics with the numba kernel. Returns int64 matrix"""
+    global NUMBA_KERNEL  # pylint: disable=global-statement
+    if NUMBA_KERNEL is None:
+        NUMBA_KERNEL = numba.njit(cache=True, nogil=True)(loop_kernel)
+    result = numpy.zeros((len(offsets) - 1, len(METRICS)), dtype=numpy.int64)
+    NUMBA_KERNEL(values, flags, offsets, result)
+    return result
+
+
+def compute(values, flags, offsets, engine="auto"):
+    """Compute metrics of ragged array. Returns int64 matrix (notebooks x METRICS)
+
+    The engine is either numpy, numba, or auto (numba, if it is installed)
+    """
+    if engine == "numba" or (engine == "auto" and numba is not None):
+        return numba_kernel(values, flags, offsets)
+    return numpy_kernel(values, flags, offsets)
+
+
+def to_rows(matrix):
+    """Convert metrics matrix to notebook dicts with the extract types"""
+    for row in matrix.tolist():
+        result = dict(zip(METRICS, row))
+        unambiguous = result["unambiguous"]
+        result["unambiguous"] = [] if unambiguous == -1 else bool(unambiguous)
+        result["unordered"] = bool(result["unordered"])
+        yield result
+
+
+def notebook_metrics(cells, engine="auto"):
+    """Compute metrics of a single notebook from (count, empty) code cells"""
+    return next(to_rows(compute(*encode([cells]), engine=engine)))
@@ -0,0 +1,335 @@
+"""Parallel operations: extract notebooks using a pool of processes"""
+import multiprocessing
+import os
+import time
+import traceback
+
+from functools import partial
+from multiprocessing.connection import wait
+
+from . import profiling
+from .archive import close_archives
+from .cache import ExtractionCache
+from .extract import load, create_default, error_result, quiet
+
+WORKER_CACHE = None
+
+# Small Python notebook loaded by warm_up
+WARM_UP_NOTEBOOK = (
+    b'{"cells": [{"cell_type": "code", "execution_count": 1, "metadata": {}, '
+    b'"outputs": [], "source": "%matplotlib inline\\nx = 1"}, '
+    b'{"cell_type": "markdown", "metadata": {}, "source": "# Warm up"}], '
+    b'"metadata": {"language_info": {"name": "python", "version": "3.8.5"}}, '
+    b'"nbformat": 4, "nbformat_minor": 4}'
+)
+
+
+def warm_up(kwargs):
+    """Load a small notebook with the load kwargs
+
+    Lazy imports (nbformat and its schemas, numpy, IPython) and the
+    compilation of the numba metrics kernel happen here, instead of in the
+    first notebook of the worker
+    """
+    options = dict(kwargs, vprint=quiet)
+    options.pop("profile", None)
+    load("warm-up.ipynb", data=WARM_UP_NOTEBOOK, **options)
+    if profiling.PROFILER is not None:
+        profiling.PROFILER.take()
+
+
+def init_worker(cache_path=None, kwargs=None):
+    """Initialize worker state once per process
+
+    With the load kwargs, the worker is warmed up (see warm_up)
+    """
+    global WORKER_CACHE  # pylint: disable=global-statement
+    close_archives()
+    if cache_path is not None:
+        WORKER_CACHE = ExtractionCache(cache_path)
+    if kwargs is not None:
+        warm_up(kwargs)
+
+
+def task_name(task):
+    """Return notebook name of task"""
+    return task[0] if isinstance(task, tuple) else task
+
+
+def load_task(task, profile=False, **kwargs):
+    """Load notebook capturing unexpected errors as load-error
+
+    The task is either a name or a (name, file content, file hash) tuple.
+    The file hash is None if it is not known.
+    With profile=True, returns (result, stage times of the notebook)
+    """
+    if profile:
+        profiler = profiling.enable()
+        with profiling.stage("load"):
+            result = load_task(task, **kwargs)
+        return result, profiler.take()
+    name, data, file_hash = task if isinstance(task, tuple) else (task, None, None)
+    try:
+        return load(name, cache=WORKER_CACHE, data=data, file_hash=file_hash, **kwargs)
+    except Exception:  # pylint: disable=broad-except
+        return error_result(
+            create_default(name), "load-error", traceback.format_exc(),
+            kwargs.get("include"), kwargs.get("exclude")
+        )
+
+
+def record_profile(results):
+    """Record stage times of (result, times) results in the profiler. Yields results
+
+    Results without times (see budget_result) are yielded as they are
+    """
+    for result in results:
+        if isinstance(result, tuple):
+            result, times = result
+            profiling.PROFILER.record(times)
+        yield result
+
+
+def budget_result(name, status, message, include=None, exclude=None):
+    """Create result for notebook that could not be loaded by a worker"""
+    return error_result(create_default(name), status, message, include, exclude)
+
+
+def process_usage(pid):
+    """Return (cpu seconds, rss bytes) of process from /proc
+
+    Returns None for values that are not available
+    """
+    cpu = rss = None
+    try:
+        with open("/proc/{}/stat".format(pid), "r") as stat:
+            fields = stat.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        with open("/proc/{}/statm".format(pid), "r") as statm:
+            rss = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        pass
+    return cpu, rss
+
+
+def worker_loop(connection, started, cache_path, max_tasks, kwargs):
+    """Load notebooks received from connection until None or max_tasks
+
+    The worker is warmed up before the first notebook. Before each notebook,
+    it stores the process CPU time and the wall time in started, so the
+    supervisor counts neither the worker startup nor the warm up
+    """
+    init_worker(cache_path, kwargs)
+    tasks = 0
+    while max_tasks is None or tasks < max_tasks:
+        message = connection.recv()
+        if message is None:
+            break
+        index, name = message
+        started[0], started[1] = time.process_time(), time.time()
+        connection.send((index, load_task(name, **kwargs)))
+        tasks += 1
+    connection.close()
+
+
+class SupervisedWorker(object):
+    """Worker process that loads one notebook at a time"""
+
+    def __init__(self, cache_path, max_tasks, kwargs):
+        self.connection, child = multiprocessing.Pipe()
+        self.started = multiprocessing.Array("d", [-1.0, -1.0], lock=False)
+        self.process = multiprocessing.Process(
+            target=worker_loop,
+            args=(child, self.started, cache_path, max_tasks, kwargs),
+            daemon=True
+        )
+        self.process.start()
+        child.close()
+        self.max_tasks = max_tasks
+        self.tasks = 0
+        self.task = None
+
+    def send(self, index, name):
+        """Send notebook to worker"""
+        self.task = (index, name)
+        self.tasks += 1
+        self.started[0] = self.started[1] = -1.0
+        self.connection.send(self.task)
+
+    def retiring(self):
+        """Check if worker exits after its current task"""
+        return self.max_tasks is not None and self.tasks >= self.max_tasks
+
+    def usage(self):
+        """Return (cpu seconds, rss bytes) used by the current task
+
+        The CPU time is 0 until the worker starts the task
+        """
+        start_cpu, start_time = self.started[0], self.started[1]
+        cpu, rss = process_usage(self.process.pid)
+        if start_cpu < 0:
+            return 0.0, rss
+        if cpu is None:
+            return time.time() - start_time, rss
+        return cpu - start_cpu, rss
+
+    def stop(self, kill=False):
+        """Stop worker process"""
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.connection.send(None)
+            except OSError:
+                pass
+        self.process.join()
+        self.connection.close()
+
+
+def supervised_imap_load(
+        names, jobs=None, ordered=True, cache_path=None, cpu_limit=None,
+        memory_limit=None, max_tasks=None, poll_interval=0.1, **kwargs
+):
+    """Load notebooks in supervised worker processes. Yields results
+
+    Workers that exceed cpu_limit seconds or memory_limit bytes of RSS on a
+    notebook are killed and replaced. The notebook gets the status
+    load-timeout or load-oom. Workers are replaced after max_tasks
+    notebooks. CPU time and RSS come from /proc. Without /proc, the wall
+    time is used as CPU time and the memory limit is not enforced
+    """
+    jobs = jobs or multiprocessing.cpu_count()
+    pending = enumerate(names)
+    workers = []
+    ready = {}
+    next_index = 0
+    exhausted = False
+    filters = kwargs.get("include"), kwargs.get("exclude")
+
+    def new_worker():
+        """Start worker"""
+        return SupervisedWorker(cache_path, max_tasks, kwargs)
+
+    def dispatch(worker):
+        """Send next notebook to worker. Returns False if there are no notebooks"""
+        nonlocal exhausted
+        if exhausted:
+            return False
+        try:
+            index, name = next(pending)
+        except StopIteration:
+            exhausted = True
+            return False
+        worker.send(index, name)
+        return True
+
+    def replace(worker, kill):
+        """Replace worker by a new one"""
+        worker.stop(kill=kill)
+        workers.remove(worker)
+        if not exhausted:
+            workers.append(new_worker())
+
+    for _ in range(jobs):
+        workers.append(new_worker())
+    for worker in list(workers):
+        if not dispatch(worker):
+            replace(worker, kill=False)
+
+    try:
+        while workers:
+            for worker in list(workers):
+                if worker.task is None and not dispatch(worker):
+                    replace(worker, kill=False)
+            connections = {worker.connection: worker for worker in workers if worker.task is not None}
+            for connection in wait(list(connections), poll_interval):
+                worker = connections[connection]
+                try:
+                    index, result = connection.recv()
+                except (EOFError, OSError):
+                    index, task = worker.task
+                    result = budget_result(
+                        task_name(task), "load-error",
+                        "Worker exited with code {}".format(worker.process.exitcode), *filters
+                    )
+                    worker.task = None
+                    replace(worker, kill=True)
+                else:
+                    worker.task = None
+                    if worker.retiring():
+                        replace(worker, kill=False)
+                ready[index] = result
+            for worker in list(workers):
+                if worker.task is None:
+                    continue
+                cpu, rss = worker.usage()
+                index, task = worker.task
+                name = task_name(task)
+                if cpu_limit is not None and cpu > cpu_limit:
+                    ready[index] = budget_result(
+                        name, "load-timeout",
+                        "CPU time limit of {}s exceeded".format(cpu_limit), *filters
+                    )
+                elif memory_limit is not None and rss is not None and rss > memory_limit:
+                    ready[index] = budget_result(
+                        name, "load-oom",
+                        "Memory limit of {} bytes exceeded".format(memory_limit), *filters
+                    )
+                else:
+                    continue
+                worker.task = None
+                replace(worker, kill=True)
+            if ordered:
+                while next_index in ready:
+                    yield ready.pop(next_index)
+                    next_index += 1
+            else:
+                for index in list(ready):
+                    yield ready.pop(index)
+    finally:
+        for worker in workers:
+            worker.stop(kill=True)
+
+
+def imap_load(
+        names, jobs=None, ordered=True, chunksize=8, cache_path=None,
+        cpu_limit=None, memory_limit=None, max_tasks=None, **kwargs
+):
+    """Load notebooks in parallel. Yields results as they are ready
+
+    Use jobs=None to use all cores and jobs=1 to load in the current process.
+    Use cache_path to share an ExtractionCache file among workers.
+    With cpu_limit (seconds) or memory_limit (bytes), notebooks are loaded
+    one at a time by supervised workers (see supervised_imap_load).
+    Use max_tasks to replace workers after max_tasks notebooks.
+    Names can also be (name, file content, file hash) tasks (see load_task).
+    If profiling is on, stage times of workers are recorded in the profiler
+    """
+    if profiling.PROFILER is not None and "profile" not in kwargs:
+        yield from record_profile(imap_load(
+            names, jobs=jobs, ordered=ordered, chunksize=chunksize,
+            cache_path=cache_path, cpu_limit=cpu_limit, memory_limit=memory_limit,
+            max_tasks=max_tasks, profile=True, **kwargs
+        ))
+        return
+    if cpu_limit is not None or memory_limit is not None:
+        for result in supervised_imap_load(
+                names, jobs=jobs, ordered=ordered, cache_path=cache_path,
+                cpu_limit=cpu_limit, memory_limit=memory_limit,
+                max_tasks=max_tasks, **kwargs
+        ):
+            yield result
+        return
+    task = partial(load_task, **kwargs)
+    if jobs == 1:
+        init_worker(cache_path)
+        for name in names:
+            yield task(name)
+        return
+    with multiprocessing.Pool(
+            jobs, initializer=init_worker, initargs=(cache_path,),
+            maxtasksperchild=max_tasks
+    ) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        for result in imap(task, names, chunksize):
+            yield result
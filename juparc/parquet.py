@@ -0,0 +1,187 @@
+"""Parquet export: columnar tables of notebooks and cells
+
+Notebooks are written to the notebooks table, with the create_default
+columns, and their cells to the cells table, with the create_cell columns
+and one column per AST counter of code-features. Both tables are Hive
+partitioned datasets (e.g., language=python/kernel=python3/part-0-0.parquet)
+that can be read with column pruning and predicate pushdown by pyarrow,
+pandas, or dask. Requires pyarrow
+"""
+import json
+import os
+
+try:
+    import pyarrow
+    import pyarrow.dataset
+except ImportError:
+    pyarrow = None
+
+from .code import default_ast_features
+from .extract import create_default, create_cell, int_or_none
+
+PARTITION_BY = ["language", "kernel"]
+
+# Cell columns copied from the notebook
+CELL_KEYS = ["name", "language", "kernel"]
+
+# Values stored as JSON strings
+JSON_COLUMNS = {"word_counter", "modules", "names", "ipython"}
+
+
+def ast_column(key):
+    """Return cell column of AST counter"""
+    return key if key.startswith("ast_") else "ast_" + key
+
+
+def require_pyarrow():
+    """Raise ImportError if pyarrow is not installed"""
+    if pyarrow is None:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow)")
+
+
+def column_type(key, value):
+    """Return arrow type of a create_default or create_cell column"""
+    if key in JSON_COLUMNS or key == "nbformat":
+        return pyarrow.string()
+    if key in {"unambiguous", "unordered", "python"}:
+        return pyarrow.bool_()
+    if key in {"size", "index", "execution_count", "lines"} or isinstance(value, int):
+        return pyarrow.int64()
+    if isinstance(value, list):
+        return pyarrow.list_(pyarrow.string())
+    return pyarrow.string()
+
+
+def notebooks_schema():
+    """Schema of the notebooks table"""
+    require_pyarrow()
+    fields = [
+        (key, column_type(key, value))
+        for key, value in create_default().items() if key != "cells"
+    ]
+    fields.append(("duplicate_of", pyarrow.string()))
+    return pyarrow.schema(fields)
+
+
+def cells_schema():
+    """Schema of the cells table"""
+    require_pyarrow()
+    fields = [(key, pyarrow.string()) for key in CELL_KEYS]
+    fields.extend((key, column_type(key, value)) for key, value in create_cell().items())
+    fields.extend(
+        (ast_column(key), pyarrow.string() if key == "ast_others" else pyarrow.int64())
+        for key in default_ast_features()
+    )
+    fields.extend((key, pyarrow.string()) for key in ["modules", "names", "ipython"])
+    return pyarrow.schema(fields)
+
+
+def column_value(key, value):
+    """Convert JSON value to the column type"""
+    if value is None:
+        return None
+    if key in JSON_COLUMNS:
+        return json.dumps(value)
+    if key == "nbformat":
+        return str(value)
+    if key == "unambiguous":
+        return None if value == [] else bool(value)
+    if key == "execution_count":
+        return int_or_none(value)
+    return value
+
+
+def notebook_row(notebook, columns):
+    """Convert extracted notebook to row of the notebooks table"""
+    return {key: column_value(key, notebook.get(key)) for key in columns}
+
+
+def cell_rows(notebook, columns):
+    """Convert cells of extracted notebook to rows of the cells table"""
+    for cell in notebook.get("cells") or []:
+        row = {key: column_value(key, notebook.get(key)) for key in CELL_KEYS}
+        for key in columns:
+            if key not in row:
+                row[key] = column_value(key, cell.get(key))
+        ast = cell.get("ast")
+        if isinstance(ast, dict):
+            for key, value in ast.items():
+                row[ast_column(key)] = value
+        yield row
+
+
+def batches(notebooks, batch_size):
+    """Group notebooks in lists of batch_size"""
+    batch = []
+    for notebook in notebooks:
+        batch.append(notebook)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_table(rows, schema, path, basename, partition_by):
+    """Write rows to partitioned dataset. Files get the basename prefix"""
+    if not rows:
+        return
+    table = pyarrow.Table.from_pylist(rows, schema=schema)
+    pyarrow.dataset.write_dataset(
+        table, path, format="parquet",
+        partitioning=partition_by or None,
+        partitioning_flavor="hive" if partition_by else None,
+        basename_template=basename + "-{i}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def write_parquet(notebooks, path, batch_size=10000, partition_by=None, cells=True):
+    """Write notebooks to path/notebooks and their cells to path/cells
+
+    Notebooks are converted and written in batches of batch_size, so the
+    input is not loaded at once. Returns the number of notebooks.
+    Raises FileExistsError if path already has the tables
+    """
+    require_pyarrow()
+    for table in ["notebooks", "cells"]:
+        if os.path.exists(os.path.join(path, table)):
+            raise FileExistsError("{} already exists".format(os.path.join(path, table)))
+    partition_by = PARTITION_BY if partition_by is None else partition_by
+    nb_schema, cell_schema = notebooks_schema(), cells_schema()
+    total = 0
+    for index, batch in enumerate(batches(notebooks, batch_size)):
+        basename = "part-{}".format(index)
+        write_table(
+            [notebook_row(notebook, nb_schema.names) for notebook in batch],
+            nb_schema, os.path.join(path, "notebooks"), basename, partition_by
+        )
+        if cells:
+            write_table(
+                [row for notebook in batch for row in cell_rows(notebook, cell_schema.names)],
+                cell_schema, os.path.join(path, "cells"), basename, partition_by
+            )
+        total += len(batch)
+    return total
+
+
+def read_table(path, table="notebooks", columns=None, filters=None, partition_by=None):
+    """Read table written by write_parquet as a pyarrow Table
+
+    Only the columns are read. filters is a pyarrow.dataset expression
+    (e.g., pyarrow.dataset.field("language") == "python") that skips
+    partitions and row groups that do not match it
+    """
+    require_pyarrow()
+    schema = notebooks_schema() if table == "notebooks" else cells_schema()
+    partition_by = PARTITION_BY if partition_by is None else partition_by
+    partitioning = None
+    if partition_by:
+        partitioning = pyarrow.dataset.partitioning(
+            pyarrow.schema([schema.field(key) for key in partition_by]),
+            flavor="hive"
+        )
+    dataset = pyarrow.dataset.dataset(
+        os.path.join(path, table), format="parquet", partitioning=partitioning
+    )
+    return dataset.to_table(columns=columns, filter=filters)
@@ -0,0 +1,163 @@
+"""Profiling: time and count named stages of each notebook
+
+Code is instrumented with `with stage("name"):`. Profiling is off by
+default: stage returns a shared no-op context manager, so instrumented code
+costs a function call. After enable(), stage times and calls are summed per
+notebook. The sums of each notebook are aggregated into log2 histograms
+(see Profiler.report). Stages may be nested: their times are inclusive.
+
+Worker processes send the stage times of each notebook to the parent with
+the result (see juparc.parallel.load_task)
+"""
+import json
+import math
+import sys
+import time
+
+from contextlib import nullcontext
+
+PROFILER = None
+
+NULL_STAGE = nullcontext()
+
+# Upper bound of the first histogram bucket in seconds. Each bucket doubles it
+FIRST_BUCKET = 1e-6
+
+
+class Stage(object):
+    """Context manager that adds its elapsed time to a profiler stage"""
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+
+
+class StageStats(object):
+    """Aggregated times of a stage over notebooks"""
+
+    def __init__(self):
+        self.notebooks = 0
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = {}
+
+    def add(self, calls, seconds):
+        """Add the calls and time of a notebook"""
+        self.notebooks += 1
+        self.calls += calls
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        bucket = max(0, math.ceil(math.log2(seconds / FIRST_BUCKET))) if seconds > 0 else 0
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def report(self):
+        """Return dict with the stats and the histogram of the notebook times
+
+        The histogram has [upper bound in seconds, notebooks] of non-empty buckets
+        """
+        return {
+            "notebooks": self.notebooks,
+            "calls": self.calls,
+            "total": self.total,
+            "mean": self.total / self.notebooks if self.notebooks else 0.0,
+            "max": self.max,
+            "histogram": [
+                [FIRST_BUCKET * 2 ** bucket, self.buckets[bucket]]
+                for bucket in sorted(self.buckets)
+            ],
+        }
+
+
+class Profiler(object):
+    """Stage times of the current notebook and their aggregation"""
+
+    def __init__(self):
+        self.current = {}
+        self.stages = {}
+        self.notebooks = 0
+        self.start = time.perf_counter()
+
+    def add(self, name, seconds):
+        """Add a call of stage to the current notebook"""
+        entry = self.current.get(name)
+        if entry is None:
+            self.current[name] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def take(self):
+        """Return and reset the {stage: [calls, seconds]} of the current notebook"""
+        current, self.current = self.current, {}
+        return current
+
+    def record(self, times):
+        """Aggregate the {stage: [calls, seconds]} of a notebook"""
+        self.notebooks += 1
+        for name, (calls, seconds) in times.items():
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = StageStats()
+            stats.add(calls, seconds)
+
+    def report(self):
+        """Return JSON report, with stages sorted by total time"""
+        return {
+            "notebooks": self.notebooks,
+            "wall_time": time.perf_counter() - self.start,
+            "stages": {
+                name: stats.report() for name, stats in sorted(
+                    self.stages.items(), key=lambda item: -item[1].total
+                )
+            },
+        }
+
+    def write(self, path="-"):
+        """Write JSON report to path. Use - for stderr"""
+        report = json.dumps(self.report(), indent=2)
+        if path == "-":
+            sys.stderr.write(report + "\n")
+            return
+        with open(path, "w", encoding="utf-8") as output:
+            output.write(report + "\n")
+
+
+def enable():
+    """Start profiling in this process. Returns the profiler"""
+    global PROFILER  # pylint: disable=global-statement
+    if PROFILER is None:
+        PROFILER = Profiler()
+    return PROFILER
+
+
+def stage(name):
+    """Return context manager that times stage name, if profiling is on"""
+    if PROFILER is None:
+        return NULL_STAGE
+    return Stage(PROFILER, name)
+
+
+def notebook_done():
+    """Aggregate the stage times of the current notebook, if profiling is on"""
+    if PROFILER is not None:
+        PROFILER.record(PROFILER.take())
+
+
+def add_profile_argument(parser):
+    """Add --profile argument to parser"""
+    parser.add_argument(
+        "--profile", default=None, nargs="?", const="-", metavar="FILE",
+        help="Time the stages of each notebook and write a JSON report with "
+             "histograms to FILE. Default: stderr"
+    )
@@ -0,0 +1,425 @@
+"""Notebook readers: parse notebook files into v4 notebook dicts"""
+import hashlib
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+READERS = ["nbformat", "fast", "stream"]
+
+# Same as nbformat.v4.convert._mime_map
+MIME_MAP = {
+    "text": "text/plain",
+    "html": "text/html",
+    "svg": "image/svg+xml",
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "latex": "text/latex",
+    "json": "application/json",
+    "javascript": "application/javascript",
+}
+
+MULTILINE_OUTPUTS = ["text", "html", "svg", "latex", "javascript", "json"]
+
+# Output keys kept by the stream reader. Other keys are payloads or skipped
+# (see output_key_role). The v3 json alias is kept to be decoded as in nbformat
+STREAM_OUTPUT_KEYS = {
+    "output_type", "name", "stream", "execution_count", "prompt_number", "metadata",
+    "json",
+}
+
+# Roles of JSON values in the stream reader: (role, key or None for items) -> role
+STREAM_ROLES = {
+    ("notebook", "cells"): "cells",
+    ("notebook", "worksheets"): "worksheets",
+    ("worksheets", None): "worksheet",
+    ("worksheet", "cells"): "cells",
+    ("cells", None): "cell",
+    ("cell", "outputs"): "outputs",
+    ("cell", "attachments"): "attachments",
+    ("outputs", None): "output",
+    ("output", "data"): "bundle",
+}
+
+
+class FastReaderError(Exception):
+    """Document is not supported by the fast reader"""
+
+
+class PayloadSize(int):
+    """Length of an output payload skipped by the stream reader"""
+
+
+class HashingReader(object):
+    """File wrapper that hashes and counts the bytes read through it"""
+
+    def __init__(self, ofile):
+        self.ofile = ofile
+        self.sha1 = hashlib.sha1()
+        self.size = 0
+
+    def read(self, size=-1):
+        """Read chunk from file"""
+        data = self.ofile.read(size)
+        self.sha1.update(data)
+        self.size += len(data)
+        return data
+
+    def read_rest(self, size=65536):
+        """Consume the rest of the file"""
+        while self.read(size):
+            pass
+
+
+def decode(data):
+    """Decode file content as utf-8"""
+    if isinstance(data, bytes):
+        return data.decode("utf-8")
+    return data
+
+
+def loads_json(data):
+    """Parse JSON using orjson, if it is available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(decode(data))
+
+
+def nbformat_version(notebook):
+    """Return notebook version as major.minor"""
+    version = "{0[nbformat]}".format(notebook)
+    if "nbformat_minor" in notebook:
+        version += ".{0[nbformat_minor]}".format(notebook)
+    return version
+
+
+def read_nbformat(data):
+    """Read notebook using nbformat validation
+
+    Returns the notebook in its original version and the version
+    """
+    import nbformat as nbf
+    notebook = nbf.reads(decode(data), nbf.NO_CONVERT)
+    return notebook, nbformat_version(notebook)
+
+
+def convert_notebook(notebook):
+    """Convert notebook to v4. Notebooks that are already v4 are not changed"""
+    import nbformat as nbf
+    return nbf.convert(notebook, 4)
+
+
+def check(condition):
+    """Raise FastReaderError if condition is false"""
+    if not condition:
+        raise FastReaderError()
+
+
+def join_strings(lines, separator=""):
+    """Join list of strings"""
+    check(all(isinstance(line, str) for line in lines))
+    return separator.join(lines)
+
+
+def join_split_lines(lines):
+    """Join lines created either by splitlines() or splitlines(True)"""
+    check(all(isinstance(line, str) for line in lines))
+    if lines and lines[0].endswith(("\n", "\r")):
+        return "".join(lines)
+    return "\n".join(lines)
+
+
+def fast_v4(notebook):
+    """Rejoin multiline sources and outputs of v4 notebook"""
+    check(isinstance(notebook.get("metadata"), dict))
+    check(isinstance(notebook.get("cells"), list))
+    for cell in notebook["cells"]:
+        check(isinstance(cell, dict))
+        check(isinstance(cell.get("cell_type", ""), str))
+        check(isinstance(cell.get("metadata"), dict))
+        if isinstance(cell.get("source"), list):
+            cell["source"] = join_strings(cell["source"])
+        attachments = cell.get("attachments", {})
+        check(isinstance(attachments, dict))
+        for attachment in attachments.values():
+            check(isinstance(attachment, dict))
+        if cell.get("cell_type") == "code":
+            outputs = cell.get("outputs", [])
+            check(isinstance(outputs, list))
+            for output in outputs:
+                check(isinstance(output, dict))
+                output_type = output.get("output_type", "")
+                if output_type in {"execute_result", "display_data"}:
+                    check(isinstance(output.get("data", {}), dict))
+                elif output_type and isinstance(output.get("text"), list):
+                    output["text"] = join_strings(output["text"])
+    return notebook
+
+
+def fast_upgrade_output(output):
+    """Upgrade v3 output to v4, as nbformat.v4.convert.upgrade_output"""
+    check(isinstance(output, dict))
+    output_type = output["output_type"]
+    if output_type in {"pyout", "display_data"}:
+        metadata = output.setdefault("metadata", {})
+        check(isinstance(metadata, dict))
+        if output_type == "pyout":
+            output["output_type"] = "execute_result"
+            output["execution_count"] = output.pop("prompt_number", None)
+        data = {}
+        for key in list(output):
+            if key in {"output_type", "execution_count", "metadata"}:
+                continue
+            data[key] = output.pop(key)
+        for mapping in (data, metadata):
+            for alias, mime in MIME_MAP.items():
+                if alias in mapping:
+                    mapping[mime] = mapping.pop(alias)
+        output["data"] = data
+        if "application/json" in data and not isinstance(data["application/json"], PayloadSize):
+            check(isinstance(data["application/json"], str))
+            data["application/json"] = json.loads(data["application/json"])
+    elif output_type == "pyerr":
+        output["output_type"] = "error"
+    elif output_type == "stream":
+        output["name"] = output.pop("stream", "stdout")
+    return output
+
+
+def fast_upgrade_cell(cell, join, from_v2=False):
+    """Rejoin lines of v2/v3 cell and upgrade it to v4"""
+    check(isinstance(cell, dict))
+    cell_type = cell["cell_type"]
+    check(isinstance(cell_type, str))
+    if cell_type == "code":
+        if isinstance(cell.get("input"), list):
+            cell["input"] = join(cell["input"])
+        check(isinstance(cell["outputs"], list))
+        for output in cell["outputs"]:
+            check(isinstance(output, dict))
+            for key in MULTILINE_OUTPUTS:
+                if isinstance(output.get(key), list):
+                    output[key] = join(output[key])
+            if from_v2:
+                check(all(
+                    isinstance(output[key], (str, PayloadSize))
+                    for key in ("png", "jpeg") if key in output
+                ))
+    else:
+        for key in ["source", "rendered"]:
+            if isinstance(cell.get(key), list):
+                cell[key] = join(cell[key])
+
+    check(isinstance(cell.setdefault("metadata", {}), dict))
+    if cell_type == "code":
+        cell.pop("language", "")
+        if "collapsed" in cell:
+            cell["metadata"]["collapsed"] = cell.pop("collapsed")
+        cell["source"] = cell.pop("input", "")
+        cell["execution_count"] = cell.pop("prompt_number", None)
+        cell["outputs"] = [fast_upgrade_output(output) for output in cell["outputs"]]
+    elif cell_type == "heading":
+        cell["cell_type"] = "markdown"
+        level = cell.pop("level", 1)
+        source = cell.get("source", "")
+        check(isinstance(source, str) and isinstance(level, int))
+        cell["source"] = "{} {}".format("#" * level, " ".join(source.splitlines()))
+    elif cell_type == "html":
+        cell["cell_type"] = "markdown"
+    return cell
+
+
+def fast_v3(notebook, from_v2=False):
+    """Upgrade v2/v3 notebook to v4 without validation"""
+    check(isinstance(notebook.get("metadata"), dict))
+    check(isinstance(notebook.get("worksheets"), list))
+    join = join_split_lines
+    if from_v2:
+        join = lambda lines: join_strings(lines, "\n")
+    cells = []
+    for worksheet in notebook.pop("worksheets"):
+        check(isinstance(worksheet, dict) and isinstance(worksheet["cells"], list))
+        for cell in worksheet["cells"]:
+            cells.append(fast_upgrade_cell(cell, join, from_v2))
+    notebook["cells"] = cells
+    notebook["metadata"].pop("name", "")
+    notebook["metadata"].pop("signature", "")
+    notebook["nbformat"] = 4
+    return notebook
+
+
+def fast_version(notebook):
+    """Return (major, minor) version of notebook, as nbformat.reader.get_version
+
+    Raises FastReaderError for versions that nbformat validation rejects:
+    the validator requires int versions and has no v3 schema for minor
+    versions above 0
+    """
+    major = notebook.get("nbformat", 1)
+    minor = notebook.get("nbformat_minor", 0)
+    check(isinstance(major, int) and isinstance(minor, int))
+    check(major != 3 or minor <= 0)
+    return major, minor
+
+
+def fast_upgrade(notebook):
+    """Upgrade parsed v2, v3, or v4 notebook without validation
+
+    Returns the notebook upgraded to v4 and the original version
+    """
+    try:
+        check(isinstance(notebook, dict))
+        major, _ = fast_version(notebook)
+        version = nbformat_version(notebook)
+        if major == 4:
+            return fast_v4(notebook), version
+        if major == 3:
+            return fast_v3(notebook), version
+        if major == 2:
+            return fast_v3(notebook, from_v2=True), version
+    except (KeyError, TypeError, AttributeError, ValueError):
+        pass
+    raise FastReaderError()
+
+
+def read_fast(data):
+    """Read notebook without nbformat validation
+
+    Supports v2, v3, and v4 notebooks. Returns the notebook upgraded to v4
+    and the original version. Raises FastReaderError for documents that
+    require nbformat to produce the same result
+    """
+    try:
+        notebook = loads_json(data)
+    except ValueError:
+        raise FastReaderError()
+    return fast_upgrade(notebook)
+
+
+def payload_size(events, event, value, strict=True):
+    """Consume JSON value from ijson events. Returns the length of its strings
+
+    Strict payloads must be a string or a list of strings, as nbformat
+    requires for non-JSON mimetypes
+    """
+    if event == "string":
+        return len(value)
+    check(not strict or event == "start_array")
+    if event not in ("start_map", "start_array"):
+        return 0
+    size = 0
+    depth = 1
+    for event, value in events:
+        if event in ("start_map", "start_array"):
+            check(not strict)
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+            if not depth:
+                return size
+        elif event in ("string", "map_key"):
+            size += len(value)
+        else:
+            check(not strict)
+    return size
+
+
+def output_key_role(key):
+    """Return role of output key in the stream reader
+
+    v3 MIME payloads (aliases or mimetypes) must be strings or lists of
+    strings. Other keys (e.g., transient of display_data) may have any
+    JSON value and are skipped as well
+    """
+    if key in STREAM_OUTPUT_KEYS:
+        return None
+    if key in MIME_MAP or "/" in key:
+        return "payload"
+    return "json_payload"
+
+
+def stream_value(events, event, value, role):
+    """Build JSON value from ijson events
+
+    Output payloads and attachments are replaced by their PayloadSize
+    """
+    if role in ("payload", "json_payload"):
+        strict = role == "payload"
+        return PayloadSize(payload_size(events, event, value, strict))
+    if event == "start_map":
+        result = {}
+        for event, value in events:
+            if event == "end_map":
+                return result
+            key = value
+            if role == "output":
+                key_role = STREAM_ROLES.get((role, key), output_key_role(key))
+            elif role == "bundle":
+                key_role = "json_payload" if key.endswith("json") else "payload"
+            elif role == "attachments":
+                key_role = "bundle"
+            else:
+                key_role = STREAM_ROLES.get((role, key))
+            event, value = next(events)
+            result[key] = stream_value(events, event, value, key_role)
+        raise FastReaderError()
+    if event == "start_array":
+        result = []
+        item_role = STREAM_ROLES.get((role, None))
+        for event, value in events:
+            if event == "end_array":
+                return result
+            result.append(stream_value(events, event, value, item_role))
+        raise FastReaderError()
+    return value
+
+
+def read_stream(path):
+    """Read notebook file without building output payloads in memory
+
+    Requires ijson. Output payloads are replaced by their lengths, so the
+    memory usage depends on the size of sources instead of outputs.
+    Returns the notebook, the original version, the file size, and the
+    file sha1. Falls back to nbformat for documents it cannot handle
+    """
+    if ijson is None:
+        raise ImportError("The stream reader requires ijson")
+    with open(path, "rb") as ofile:
+        hashing = HashingReader(ofile)
+        try:
+            events = iter(ijson.basic_parse(hashing, use_float=True))
+            event, value = next(events)
+            notebook = stream_value(events, event, value, "notebook")
+            for _ in events:
+                pass
+            hashing.read_rest()
+            notebook, version = fast_upgrade(notebook)
+            return notebook, version, hashing.size, hashing.sha1.hexdigest()
+        except (ijson.JSONError, FastReaderError, StopIteration):
+            pass
+        ofile.seek(0)
+        data = ofile.read()
+    notebook, version = read_nbformat(data)
+    return notebook, version, len(data), hashlib.sha1(memoryview(data)).hexdigest()
+
+
+def read_notebook(data, reader="nbformat"):
+    """Read notebook content (str or utf-8 bytes) using the selected reader
+
+    Returns the notebook and the original version. Use convert_notebook
+    to get a v4 notebook. The fast reader falls back to nbformat for
+    unsupported documents. Use read_stream for the stream reader
+    """
+    if reader in ("fast", "stream"):
+        try:
+            return read_fast(data)
+        except FastReaderError:
+            pass
+    return read_nbformat(data)
@@ -0,0 +1,145 @@
+"""Compact records: notebook and cell mappings stored in __slots__
+
+A record behaves like the dict created by the previous versions of
+create_default and create_cell, but its known fields are stored in slots
+instead of a per-object hash table. Unset slots are missing keys. Other
+keys are stored in a dict that is created only when needed. Keys are
+iterated in the field order, followed by the other keys in insertion order,
+so records serialize to the same JSON as the dicts (use json_default)
+"""
+from collections.abc import MutableMapping
+
+NOTEBOOK_FIELDS = (
+    "name", "nbformat", "kernel", "language", "language_version",
+    "max_execution_count", "total_cells", "code_cells",
+    "code_cells_with_output", "markdown_cells", "raw_cells",
+    "unknown_cell_formats", "empty_cells", "size", "sha1_file", "cells",
+    "status", "exception", "sha1_source", "word_counter",
+    "unambiguous", "actual_empty_cells", "non_executed_cells",
+    "empty_cells_middle", "empty_cells_end", "numeric_counts_total",
+    "numeric_set_total", "processing_cells", "unordered",
+    "execution_skips_total", "execution_skips_size",
+    "execution_skips_middle_total", "execution_skips_middle_size",
+)
+
+CELL_FIELDS = (
+    "index", "cell_type", "execution_count", "lines", "output_formats",
+    "legacy_output_formats", "source", "raw_source", "python", "status",
+    "exception",
+)
+
+
+class Record(MutableMapping):
+    """Mapping with fields stored in __slots__. Subclasses define FIELDS"""
+
+    __slots__ = ("_extra",)
+    FIELDS = ()
+    FIELD_SET = frozenset()
+
+    def __init__(self, items=()):
+        self._extra = None
+        if hasattr(items, "keys"):
+            items = [(key, items[key]) for key in items.keys()]
+        for key, value in items:
+            self[key] = value
+
+    def __getitem__(self, key):
+        if key in self.FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in self.FIELD_SET:
+            setattr(self, key, value)
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self.FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+            return
+        if self._extra is None:
+            raise KeyError(key)
+        del self._extra[key]
+
+    def __iter__(self):
+        for field in self.FIELDS:
+            if hasattr(self, field):
+                yield field
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, key):
+        if key in self.FIELD_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def get(self, key, default=None):
+        if key in self.FIELD_SET:
+            return getattr(self, key, default)
+        if self._extra is None:
+            return default
+        return self._extra.get(key, default)
+
+    def __reduce__(self):
+        return (type(self), (self.to_dict(),))
+
+    def __repr__(self):
+        return "{}({!r})".format(type(self).__name__, self.to_dict())
+
+    def to_dict(self):
+        """Convert record to dict"""
+        result = {}
+        for field in self.FIELDS:
+            try:
+                result[field] = getattr(self, field)
+            except AttributeError:
+                pass
+        if self._extra:
+            result.update(self._extra)
+        return result
+
+
+class NotebookRecord(Record):
+    """Notebook record with the create_default fields"""
+
+    __slots__ = NOTEBOOK_FIELDS
+    FIELDS = NOTEBOOK_FIELDS
+    FIELD_SET = frozenset(NOTEBOOK_FIELDS)
+
+
+class CellRecord(Record):
+    """Cell record with the create_cell fields"""
+
+    __slots__ = CELL_FIELDS
+    FIELDS = CELL_FIELDS
+    FIELD_SET = frozenset(CELL_FIELDS)
+
+
+def json_default(obj):
+    """Serialize records with json.dumps(..., default=json_default)"""
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    raise TypeError("Object of type {} is not JSON serializable".format(type(obj).__name__))
+
+
+def record_hook(item):
+    """json object_hook that loads extracted notebooks and cells as records"""
+    if "cell_type" in item and "index" in item:
+        return CellRecord(item)
+    if "cells" in item and "nbformat" in item:
+        return NotebookRecord(item)
+    return item
@@ -0,0 +1,382 @@
+"""IPython syntax transformer: convert IPython cells into plain python code
+
+Transform-only version of IPython.core.inputtransformer2.TransformerManager
+(Copyright (c) IPython Development Team, Modified BSD License).
+It produces the same code as InteractiveShell.input_transformer_manager,
+but it does not import IPython, so it does not start the IPython runtime
+"""
+import re
+import tokenize
+
+# Arbitrary limit to prevent getting stuck in infinite loops
+TRANSFORM_LOOP_LIMIT = 500
+
+ESC_SHELL = "!"     # Send line to underlying system shell
+ESC_SH_CAP = "!!"   # Send line to system shell and capture output
+ESC_HELP = "?"      # Find information about object
+ESC_HELP2 = "??"    # Find extra-detailed information about object
+ESC_MAGIC = "%"     # Call magic function
+ESC_QUOTE = ","     # Autocall: split args on whitespace and quote each one
+ESC_QUOTE2 = ";"    # Autocall: quote all args as a single string
+ESC_PAREN = "/"     # Autocall: call first argument with rest of line as arguments
+
+ESCAPE_SINGLES = {"!", "?", "%", ",", ";", "/"}
+ESCAPE_DOUBLES = {"!!", "??"}
+
+INDENT_RE = re.compile(r"^[ \t]+")
+
+CLASSIC_PROMPT_RE = re.compile(r"^(>>>|\.\.\.)( |$)")
+CLASSIC_INITIAL_RE = re.compile(r"^>>>( |$)")
+IPYTHON_PROMPT_RE = re.compile(
+    r"""
+    ^(
+    ((\[nav\]|\[ins\])?\ )?     # Vi editing mode prompt
+    In\ \[\d+\]:\               # In [1]:
+    |
+    \s*\.{3,}:\ ?               # ...: continuation
+    )
+    """,
+    re.VERBOSE,
+)
+
+HELP_END_RE = re.compile(
+    r"""(%{0,2}
+    (?!\d)[\w*]+                        # Variable name
+    (\.(?!\d)[\w*]+|\[-?[0-9]+\])*      # .attr or [0]
+    )
+    (\?\??)$                            # ? or ??
+    """,
+    re.VERBOSE,
+)
+
+
+def leading_empty_lines(lines):
+    """Remove leading lines that are empty or contain only whitespace"""
+    for index, line in enumerate(lines):
+        if line and not line.isspace():
+            return lines[index:]
+    return lines
+
+
+def leading_indent(lines):
+    """Remove the indentation of the first line from all lines"""
+    match = INDENT_RE.match(lines[0]) if lines else None
+    if not match:
+        return lines
+    space = match.group(0)
+    return [line[len(space):] if line.startswith(space) else line for line in lines]
+
+
+def strip_prompts(prompt_re, initial_re=None):
+    """Create cleanup transform that removes input prompts
+
+    Prompts are removed only if the first line has an initial prompt
+    or the second line has a prompt
+    """
+    initial_re = initial_re or prompt_re
+
+    def transform(lines):
+        """Remove prompts from lines"""
+        if lines and (
+                initial_re.match(lines[0])
+                or (len(lines) > 1 and prompt_re.match(lines[1]))
+        ):
+            return [prompt_re.sub("", line, count=1) for line in lines]
+        return lines
+    return transform
+
+
+def cell_magic(lines):
+    """Transform %%magic cells"""
+    if not lines or not lines[0].startswith("%%"):
+        return lines
+    if re.match(r"%%\w+\?", lines[0]):
+        return lines
+    magic_name, _, first_line = lines[0][2:].rstrip().partition(" ")
+    body = "".join(lines[1:])
+    return ["get_ipython().run_cell_magic(%r, %r, %r)\n" % (magic_name, first_line, body)]
+
+
+def find_assign_op(token_line):
+    """Find the index of the first '=' that is not inside brackets"""
+    paren_level = 0
+    for index, token in enumerate(token_line):
+        string = token.string
+        if string == "=" and paren_level == 0:
+            return index
+        if string in {"(", "[", "{"}:
+            paren_level += 1
+        elif string in {")", "]", "}"} and paren_level > 0:
+            paren_level -= 1
+    return None
+
+
+def find_end_of_continued_line(lines, start_line):
+    """Find the last line of a line extended using backslashes"""
+    end_line = start_line
+    while lines[end_line].endswith("\\\n"):
+        end_line += 1
+        if end_line >= len(lines):
+            break
+    return end_line
+
+
+def assemble_continued_line(lines, start, end_line):
+    """Assemble a single line from backslash-continued line pieces"""
+    parts = [lines[start[0]][start[1]:]] + lines[start[0] + 1:end_line + 1]
+    return " ".join(
+        [part.rstrip()[:-1] for part in parts[:-1]] + [parts[-1].rstrip()]
+    )
+
+
+def replace_lines(lines, start_line, end_line, new_line):
+    """Replace lines from start_line to end_line (inclusive) by new_line"""
+    return lines[:start_line] + [new_line] + lines[end_line + 1:]
+
+
+def make_help_call(target, esc):
+    """Create pinfo, pinfo2 or psearch call"""
+    method = "pinfo2" if esc == "??" else "psearch" if "*" in target else "pinfo"
+    return "get_ipython().run_line_magic(%r, %r)" % (method, target)
+
+
+def tr_help(content, esc="?"):
+    """Translate lines escaped with ? or ??"""
+    if not content:
+        return "get_ipython().show_usage()"
+    return make_help_call(content, esc)
+
+
+def tr_magic(content):
+    """Translate lines escaped with %"""
+    name, _, args = content.partition(" ")
+    return "get_ipython().run_line_magic(%r, %r)" % (name, args)
+
+
+def tr_quote(content):
+    """Translate lines escaped with ,"""
+    name, _, args = content.partition(" ")
+    return '%s("%s")' % (name, '", "'.join(args.split()))
+
+
+def tr_quote2(content):
+    """Translate lines escaped with ;"""
+    name, _, args = content.partition(" ")
+    return '%s("%s")' % (name, args)
+
+
+def tr_paren(content):
+    """Translate lines escaped with /"""
+    name, _, args = content.partition(" ")
+    return "%s(%s)" % (name, ", ".join(args.split()))
+
+
+TRANSLATORS = {
+    ESC_SHELL: "get_ipython().system({!r})".format,
+    ESC_SH_CAP: "get_ipython().getoutput({!r})".format,
+    ESC_HELP: tr_help,
+    ESC_HELP2: lambda content: tr_help(content, "??"),
+    ESC_MAGIC: tr_magic,
+    ESC_QUOTE: tr_quote,
+    ESC_QUOTE2: tr_quote2,
+    ESC_PAREN: tr_paren,
+}
+
+
+def first_token(line):
+    """Return index of the first token that is not INDENT/DEDENT"""
+    index = 0
+    while index < len(line) and line[index].type in {tokenize.INDENT, tokenize.DEDENT}:
+        index += 1
+    return index
+
+
+def find_magic_assign(tokens_by_line):
+    """Find the first magic assignment (a = %foo)"""
+    for line in tokens_by_line:
+        assign = find_assign_op(line)
+        if (
+                assign is not None
+                and len(line) >= assign + 2
+                and line[assign + 1].string == "%"
+                and line[assign + 2].type == tokenize.NAME
+        ):
+            return line[assign + 1].start, None
+    return None
+
+
+def transform_magic_assign(lines, start, _):
+    """Transform magic assignment"""
+    start_line, start_col = start
+    end_line = find_end_of_continued_line(lines, start_line)
+    rhs = assemble_continued_line(lines, start, end_line)
+    magic_name, _, args = rhs[1:].partition(" ")
+    call = "get_ipython().run_line_magic({!r}, {!r})".format(magic_name, args)
+    new_line = lines[start_line][:start_col] + call + "\n"
+    return replace_lines(lines, start_line, end_line, new_line)
+
+
+def is_system_token(token):
+    """Check if token may be part of a !command. Python 3.12 tokenizes ! as OP"""
+    return token.type == tokenize.ERRORTOKEN or token.string == "!"
+
+
+def find_system_assign(tokens_by_line):
+    """Find the first system assignment (a = !foo)"""
+    for line in tokens_by_line:
+        assign = find_assign_op(line)
+        if (
+                assign is not None
+                and not line[assign].line.strip().startswith("=")
+                and len(line) >= assign + 2
+                and is_system_token(line[assign + 1])
+        ):
+            index = assign + 1
+            while index < len(line) and is_system_token(line[index]):
+                if line[index].string == "!":
+                    return line[index].start, None
+                if not line[index].string.isspace():
+                    break
+                index += 1
+    return None
+
+
+def transform_system_assign(lines, start, _):
+    """Transform system assignment"""
+    start_line, start_col = start
+    end_line = find_end_of_continued_line(lines, start_line)
+    rhs = assemble_continued_line(lines, start, end_line)
+    call = "get_ipython().getoutput({!r})".format(rhs[1:])
+    new_line = lines[start_line][:start_col] + call + "\n"
+    return replace_lines(lines, start_line, end_line, new_line)
+
+
+def find_escaped_command(tokens_by_line):
+    """Find the first escaped command (%foo, !foo, etc)"""
+    for line in tokens_by_line:
+        index = first_token(line)
+        if index < len(line) and line[index].string in ESCAPE_SINGLES:
+            return line[index].start, None
+    return None
+
+
+def transform_escaped_command(lines, start, _):
+    """Transform escaped command"""
+    start_line, start_col = start
+    end_line = find_end_of_continued_line(lines, start_line)
+    line = assemble_continued_line(lines, start, end_line)
+    if len(line) > 1 and line[:2] in ESCAPE_DOUBLES:
+        escape, content = line[:2], line[2:]
+    else:
+        escape, content = line[:1], line[1:]
+    call = TRANSLATORS[escape](content) if escape in TRANSLATORS else ""
+    new_line = lines[start_line][:start_col] + call + "\n"
+    return replace_lines(lines, start_line, end_line, new_line)
+
+
+def find_help_end(tokens_by_line):
+    """Find the first help command (foo? or foo??)"""
+    for line in tokens_by_line:
+        if len(line) > 2 and line[-2].string == "?":
+            return line[first_token(line)].start, line[-2].start
+    return None
+
+
+def transform_help_end(lines, start, q_locn):
+    """Transform help command"""
+    start_line, start_col = start
+    q_line = q_locn[0]
+    piece = "".join(lines[start_line:q_line + 1])
+    match = HELP_END_RE.search(piece[start_col:])
+    if not match:
+        raise SyntaxError(piece[start_col:])
+    new_line = piece[:start_col] + make_help_call(match.group(1), match.group(3)) + "\n"
+    return replace_lines(lines, start_line, q_line, new_line)
+
+
+CLEANUP_TRANSFORMS = [
+    leading_empty_lines,
+    leading_indent,
+    strip_prompts(CLASSIC_PROMPT_RE, CLASSIC_INITIAL_RE),
+    strip_prompts(IPYTHON_PROMPT_RE),
+]
+
+LINE_TRANSFORMS = [
+    cell_magic,
+]
+
+# (priority, find, transform). Lower numbers have higher priority for
+# matches in the same location. Thus, %foo? is a help call
+TOKEN_TRANSFORMS = [
+    (10, find_magic_assign, transform_magic_assign),
+    (10, find_system_assign, transform_system_assign),
+    (10, find_escaped_command, transform_escaped_command),
+    (5, find_help_end, transform_help_end),
+]
+
+
+def make_tokens_by_line(lines):
+    """Tokenize lines and group tokens by logical line"""
+    tokens_by_line = [[]]
+    parenlev = 0
+    try:
+        for token in tokenize.generate_tokens(iter(lines).__next__):
+            tokens_by_line[-1].append(token)
+            if token.type == tokenize.NEWLINE or (
+                    token.type == tokenize.NL and parenlev <= 0
+            ):
+                tokens_by_line.append([])
+            elif token.string in {"(", "[", "{"}:
+                parenlev += 1
+            elif token.string in {")", "]", "}"} and parenlev > 0:
+                parenlev -= 1
+    except tokenize.TokenError:
+        # Input ended in a multiline string or expression
+        pass
+    if not tokens_by_line[-1]:
+        tokens_by_line.pop()
+    return tokens_by_line
+
+
+def do_one_token_transform(lines):
+    """Find and run the transform earliest in the code
+
+    Returns (changed, lines). Code is retokenized after each transformation,
+    since tokens after IPython syntax may be invalid
+    """
+    tokens_by_line = make_tokens_by_line(lines)
+    candidates = []
+    for priority, find, transform in TOKEN_TRANSFORMS:
+        found = find(tokens_by_line)
+        if found:
+            (line, col), q_locn = found
+            if q_locn is not None:
+                q_locn = (q_locn[0] - 1, q_locn[1])
+            candidates.append(((line - 1, col, priority), transform, q_locn))
+    candidates.sort(key=lambda candidate: candidate[0])
+    for (line, col, _), transform, q_locn in candidates:
+        try:
+            return True, transform(lines, (line, col), q_locn)
+        except SyntaxError:
+            pass
+    return False, lines
+
+
+def transform_cell(cell):
+    """Transform IPython cell into python code
+
+    Same as InteractiveShell.instance().input_transformer_manager.transform_cell
+    """
+    if not cell.endswith("\n"):
+        cell += "\n"
+    lines = cell.splitlines(keepends=True)
+    for transform in CLEANUP_TRANSFORMS + LINE_TRANSFORMS:
+        lines = transform(lines)
+    for _ in range(TRANSFORM_LOOP_LIMIT):
+        changed, lines = do_one_token_transform(lines)
+        if not changed:
+            return "".join(lines)
+    raise RuntimeError(
+        "Input transformation still changing after "
+        "%d iterations. Aborting." % TRANSFORM_LOOP_LIMIT
+    )
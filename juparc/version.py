@@ -0,0 +1,2 @@
+"""Juparc version"""
+__version__ = "1.0.0"
@@ -0,0 +1,103 @@
+"""Word matcher: find vocabulary words in texts with a single regex scan"""
+import re
+
+from functools import lru_cache
+
+
+def trie_pattern(words):
+    """Create regex that matches the longest word at a position
+
+    The regex follows a trie of the words, so each position is checked
+    against all words at once
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        """Build pattern of trie node"""
+        ends = "" in node
+        branches = [
+            re.escape(char) + build(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not ends:
+            return branches[0]
+        pattern = "(?:" + "|".join(branches) + ")"
+        return pattern + "?" if ends else pattern
+
+    return build(trie)
+
+
+class WordMatcher(object):
+    """Find which words occur as substrings of a text
+
+    The regex scan finds the longest word at each non-overlapping match.
+    Words contained in a matched word come from a precomputed map. Words
+    that start inside a match and end after it are matched again only at
+    the offsets where a suffix of the match is a prefix of a word. Thus,
+    the result is the same as checking each word with 'in'. Vocabularies
+    up to SMALL_VOCABULARY words are checked with 'in', which is faster
+    """
+
+    SMALL_VOCABULARY = 32
+
+    def __init__(self, words):
+        self.words = list(dict.fromkeys(word for word in words if word))
+        self.index = {word: index for index, word in enumerate(self.words)}
+        self.regex = None
+        if len(self.words) <= self.SMALL_VOCABULARY:
+            return
+        self.contained = {
+            word: [other for other in self.words if other in word]
+            for word in self.words
+        }
+        prefixes = {
+            word[:size] for word in self.words for size in range(1, len(word))
+        }
+        self.straddle = {
+            word: [offset for offset in range(1, len(word)) if word[offset:] in prefixes]
+            for word in self.words
+        }
+        self.regex = re.compile(trie_pattern(self.words))
+
+    def find(self, text):
+        """Return list of words that occur in text, in the vocabulary order"""
+        if self.regex is None:
+            return [word for word in self.words if word in text]
+        result = set()
+        contained = self.contained
+        match_at = self.regex.match
+        for match in self.regex.finditer(text):
+            word = match.group()
+            result.update(contained[word])
+            start = match.start()
+            for offset in self.straddle[word]:
+                inner = match_at(text, start + offset)
+                if inner is not None:
+                    result.update(contained[inner.group()])
+        return sorted(result, key=self.index.__getitem__)
+
+
+@lru_cache(maxsize=16)
+def cached_matcher(words):
+    """Return compiled matcher for tuple of words"""
+    return WordMatcher(words)
+
+
+def get_matcher(words):
+    """Return compiled matcher for list of words"""
+    return cached_matcher(tuple(words))
+
+
+def read_words(path):
+    """Read vocabulary file with one word per line. Ignores empty lines"""
+    with open(path, "r", encoding="utf-8") as vocabulary:
+        return list(dict.fromkeys(
+            line.strip() for line in vocabulary if line.strip()
+        ))
@@ -7,7 +7,7 @@ setup(
     author='Joao Felipe Pimentel',
     author_email='joaofelipenp@gmail.com',
     description='Jupyter analysis tools',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
     entry_points={
         "console_scripts": [
             "juparc = juparc:main"